@@ -1,191 +1,75 @@
-import math
-import os
-import pickle
+import argparse
 import random
+import time
 
-import neat
 import pygame
 
-pygame.font.init()
-
-WIN_WIDTH, WIN_HEIGHT = 400, 600
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Space Invader")
+import assets
+from leaderboard import Leaderboard
+from profiler import FrameProfiler, NULL_PROFILER
+from replay import Recorder
+from rendering import CachedText, DirtyRenderer
+from simulation import GameWorld, SPACESHIP_HEIGHT, SPACESHIP_WIDTH, WIN_HEIGHT, WIN_WIDTH
 
 WHITE = (255, 255, 255)
 BULLET_COLOR = (255, 255, 0)
-SCORE_FONT = pygame.font.SysFont('comicsans', 30)
-GAMEO_FONT = pygame.font.SysFont('comicsans', 40)
-TEXT_FONT = pygame.font.SysFont('comicsans', 20)
-DEL_ASTEROID = pygame.USEREVENT + 1
-
-SPACESHIP_HEIGHT = 50
-SPACESHIP_WIDTH = 69
-
-SPACESHIP_IMG = pygame.image.load(os.path.join('Assets', 'spaceship.png'))
-SPACESHIP_IMG = pygame.transform.scale(SPACESHIP_IMG, (SPACESHIP_WIDTH, SPACESHIP_HEIGHT))
-SPACESHIP_IMG = pygame.transform.rotate(SPACESHIP_IMG, 180)
-
-ASTEROID_IMG = pygame.image.load(os.path.join('Assets', 'asteroid.png'))
-HEART_IMG = pygame.image.load(os.path.join('Assets', 'heart.png'))
-HEART_IMG = pygame.transform.scale(HEART_IMG, (SPACESHIP_HEIGHT, SPACESHIP_HEIGHT))
-
-BACKGROUND_IMG = pygame.image.load(os.path.join('Assets', 'space.png'))
-
-GAMEOVER_BOX = pygame.image.load(os.path.join('Assets', 'border.png'))
-GAMEOVER_BOX = pygame.transform.scale(GAMEOVER_BOX, (WIN_HEIGHT - 150, GAMEOVER_BOX.get_height()))
-LEADERBOARD_BOX = pygame.image.load(os.path.join('Assets', 'border.png'))
-LEADERBOARD_BOX = pygame.transform.rotate(LEADERBOARD_BOX, 90)
-LEADERBOARD_BOX = pygame.transform.scale(LEADERBOARD_BOX, (WIN_WIDTH + 140, WIN_HEIGHT + 140))
-
-with open('neuralNetwork', 'rb') as f:
-    g = pickle.load(f)
-local_dir = os.path.dirname(__file__)
-config_path = os.path.join(local_dir, 'config-feedforward.txt')
-config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                            neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                            config_path)
-net = neat.nn.FeedForwardNetwork.create(g, config)
-
-
-class Spaceship:
-    SPACESHIP_VELOCITY = 5
-    IMG = SPACESHIP_IMG
-
-    BULLET_VELOCITY = 5
-    BULLET_HEIGHT, BULLET_WIDTH = 10, 5
-    MAX_BULLETS = 3
-
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = SPACESHIP_WIDTH
-        self.height = SPACESHIP_HEIGHT
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.bullets = []
-        self.tick = 0
-        self.score = 0
-        self.available_asteroids = []
-        self.aimBot = False
-
-    def move_right(self):
-        """
-        moves the spaceship right as long as its right side does not go out of the screen
-        :return: None
-        """
-        if self.x + self.SPACESHIP_VELOCITY + self.width < WIN_WIDTH:
-            self.x += self.SPACESHIP_VELOCITY
-
-    def move_left(self):
-        """
-        Same thing as move right but checks that the spaceship does not go too far left outsdide
-        :return: None
-        """
-        if self.x - self.SPACESHIP_VELOCITY + 1 > 0:
-            self.x -= self.SPACESHIP_VELOCITY
-
-    def shoot(self):
-        """
-        allows us to shoot a bullet only twice per second and a maximum number of bullets.
-        bullet is just a rectangle with bullet dimensions and starting position in the middle of the spaceship
-        :return: None
-        """
-        if self.tick >= 50:
-            if len(self.bullets) <= self.MAX_BULLETS:
-                bullet = pygame.Rect(self.x + self.width // 2, self.y - self.BULLET_HEIGHT, self.BULLET_WIDTH,
-                                     self.BULLET_HEIGHT)
-                self.bullets.append(bullet)
-                self.tick = 0
-
-    def draw(self):
-        """
-        makes a rectangle for the ship and blits it
-        checks through the bullets if any have gone above the screen and adds them to remove and deletes them afterward
-        otherwise it moves the bullet up and draws it
-        :return: None
-        """
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.tick += 1
-
-        remove = []
-        for bullet in self.bullets:
-            if bullet.y < -self.BULLET_HEIGHT:
-                remove.append(bullet)
-            else:
-                bullet.y -= self.BULLET_VELOCITY
-                pygame.draw.rect(WIN, BULLET_COLOR, bullet)
-        for elem in remove:
-            self.bullets.remove(elem)
-
-        WIN.blit(self.IMG, self.rect.topleft)
-
-    def get_mask(self):
-        """
-        :return: Rectangle of the spaceship to use for collisions
-        """
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-
-    def aim_bot(self):
-        """
-        Finds out the position of where the spaceship should be to hit it and moves there
-        :return: None
-        """
-        if self.aimBot:
-            if self.available_asteroids:
-                asteroid = self.available_asteroids[0]
-                output = net.activate(
-                    (asteroid.rect.center[0], asteroid.rect.center[1], asteroid.angle, self.x, self.y))
-                if output[0] > 0:
-                    self.move_right()
-                elif output[0] < 0:
-                    self.move_left()
-                if output[1] <= 0:
-                    self.shoot()
-
-
-class Asteroid:
-    VELOCITY = 5
-
-    def __init__(self):
-        """
-        sets up the asteroid. We take it to be a square with a random length and random starting position. We displace
-        it above by its length, so it starts from the top.
-        """
-        self.length = random.randrange(50, 100, 5)
-        self.x = random.randint(0, WIN_WIDTH - self.length)
-        self.y = -self.length
-        self.IMG = pygame.transform.scale(ASTEROID_IMG, (self.length, self.length))
-        self.target_x = random.randint(SPACESHIP_WIDTH // 2,
-                                       WIN_WIDTH - SPACESHIP_WIDTH // 2)  # Random coordinate to go to
-        self.angle = math.atan((self.target_x - self.x) / (450 + self.length))  # gets an angle to aim
-        self.IMG = pygame.transform.rotate(self.IMG, self.angle)  # Random rotation
-        self.rect = pygame.Rect(self.x, self.y, self.length, self.length)
-
-    def move(self):
-        """
-        Deletes the asteroid if it goes below the screen otherwise it moves the asteroid such that the angle is
-        maintained
-        :return: None
-        """
-        if self.y > WIN_HEIGHT:
-            pygame.event.post(pygame.event.Event(DEL_ASTEROID))
-        else:
-            self.x += self.VELOCITY * math.sin(self.angle)
-            self.y += self.VELOCITY * math.cos(self.angle)
-            self.rect = pygame.Rect(self.x, self.y, self.length, self.length)
-            WIN.blit(self.IMG, self.rect.topleft)
 
-    def get_mask(self):
-        """
-        :return: Rectangle of the asteroid to use for collisions
-        """
-        return pygame.Rect(self.x, self.y, self.length, self.length)
+RENDER_FPS = 60
+MAX_FRAME_TIME = 0.25  # longest real time simulated in one go, so a stall does not turn into a burst of ticks
+
+# Set by init(), importing this module opens no window and loads nothing
+WIN = None
+SCORE_FONT = GAMEO_FONT = TEXT_FONT = None
+SPACESHIP_IMG = ASTEROID_SPRITES = HEART_IMG = BACKGROUND_IMG = GAMEOVER_BOX = LEADERBOARD_BOX = None
+BOARD = RENDERER = SCORE_TEXT = HUD_TEXT = None
+net = None
+
+
+def init():
+    """
+    Opens the window and loads the fonts, images, leaderboard and aimbot the game needs. Only the first call does
+    anything, so it is safe to call before every game
+    :return: None
+    """
+    global WIN, SCORE_FONT, GAMEO_FONT, TEXT_FONT, SPACESHIP_IMG, ASTEROID_SPRITES, HEART_IMG, BACKGROUND_IMG
+    global GAMEOVER_BOX, LEADERBOARD_BOX, BOARD, RENDERER, SCORE_TEXT, HUD_TEXT, net
+    if WIN is not None:
+        return
+
+    pygame.font.init()
+    WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption("Space Invader")
+
+    SCORE_FONT = pygame.font.SysFont('comicsans', 30)
+    GAMEO_FONT = pygame.font.SysFont('comicsans', 40)
+    TEXT_FONT = pygame.font.SysFont('comicsans', 20)
+
+    SPACESHIP_IMG = pygame.transform.scale(assets.image('spaceship.png'), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT))
+    SPACESHIP_IMG = pygame.transform.rotate(SPACESHIP_IMG, 180).convert_alpha()
+
+    ASTEROID_SPRITES = assets.asteroid_sprites()
+    HEART_IMG = pygame.transform.scale(assets.image('heart.png'), (SPACESHIP_HEIGHT, SPACESHIP_HEIGHT)).convert_alpha()
+
+    BACKGROUND_IMG = assets.image('space.png').convert()
+
+    border = assets.image('border.png')
+    GAMEOVER_BOX = pygame.transform.scale(border, (WIN_HEIGHT - 150, border.get_height())).convert_alpha()
+    LEADERBOARD_BOX = pygame.transform.rotate(border, 90)
+    LEADERBOARD_BOX = pygame.transform.scale(LEADERBOARD_BOX, (WIN_WIDTH + 140, WIN_HEIGHT + 140)).convert_alpha()
+
+    BOARD = Leaderboard('leaderBoard.txt')
+    RENDERER = DirtyRenderer(WIN, BACKGROUND_IMG)
+    SCORE_TEXT = CachedText(SCORE_FONT, WHITE)
+    HUD_TEXT = [CachedText(TEXT_FONT, WHITE) for _ in range(16)]
+
+    # The aimbot, exported from the pickled genome in neuralNetwork with network.py
+    net = assets.model('neuralNetwork.net')
 
 
 def leader_board(ship):
     """
-    displays the leader board First opens the file with the scores and gets them into a list form of integers. Then
-    displays them along with instructions
+    displays the leader board First gets the best scores from the board kept in memory. Then displays them along with
+    instructions
     :param ship: spaceship
     :return: 1 if user wants to restart else none
     """
@@ -193,12 +77,8 @@ def leader_board(ship):
     FPS = 60
     clock = pygame.time.Clock()
 
-    # reads the scores then splits them into individual scores and converts to int
-    f = open('leaderBoard.txt', 'r')
-    scores = f.read().split()
+    scores = BOARD.top()
     curScore = ship.score
-    scores = list(map(lambda x: int(x), scores))
-    f.close()
 
     while run:
         clock.tick(FPS)
@@ -261,27 +141,8 @@ def game_over(ship):
     FPS = 60
     clock = pygame.time.Clock()
 
-    # Opens the file and gets a list of all the leaderboard scores
-    f = open('leaderBoard.txt', 'r+')
-    scores = f.read().split()
-    curScore = ship.score
-    scores = list(map(lambda x: int(x), scores))
-
-    # Compares if the current score will be in the leaderboard and adds it in its position
-    if curScore >= min(scores):
-        for s in scores:
-            if curScore > s:
-                scores.pop()
-                scores.insert(1, curScore)
-                scores.sort(reverse=True)
-                break
-
-    # Empties the file contents and adds the updated leaderboard in formatted form
-    f.truncate(0)
-    f.seek(0)
-    for i in scores:
-        f.write(str(i) + ' ')
-    f.close()
+    # Adds the score to the log, the board only keeps it if it is good enough
+    BOARD.submit(ship.score)
 
     while run:
         clock.tick(FPS)
@@ -316,135 +177,147 @@ def game_over(ship):
         pygame.display.update()
 
 
-def draw_window(ship, asteroids):
+def draw_window(world, alpha=1.0, profiler=NULL_PROFILER):
     """
-    updates the window and checks for collisions between bullets and asteroids as well as asteroids and spaceship
-    then it increases/decreases the score and removes the bullets and asteroids that have collided
-    also updates the score
-    :param ship: spaceship
-    :param asteroids: list of asteroids
+    Draws the game between the last two ticks, so movement looks smooth whatever the ratio between the simulation
+    and the frame rate. Only the areas drawn in this frame or the last one are redrawn and updated
+    :param world: GameWorld
+    :param alpha: how far we are between the previous tick (0) and the current one (1)
+    :param profiler: FrameProfiler timing the drawing, its HUD is drawn on the right of the window
     :return: None
     """
-    global lives
-
-    WIN.blit(BACKGROUND_IMG, (0, 0))
-    score = SCORE_FONT.render('Score: ' + str(ship.score), True, WHITE)
-    WIN.blit(score, (15, 15))
-
-    # moves all the asteroids
-    for asteroid in asteroids:
-        asteroid.move()
-    ship.aim_bot()
-    ship.draw()
-
-    # We delete the bullets and asteroids at the end so that problems don't arise due to them being deleted while
-    # looping through a list
-    rembullets = []
-    remasteroids = []
-
-    # Checks for bullets that have hit an asteroid and deletes them and increments the score
-    for asteroid in asteroids:
-        for bullet in ship.bullets:
-            if bullet.colliderect(asteroid.get_mask()):
-                ship.score += 1
-                remasteroids.append(asteroid)
-                rembullets.append(bullet)
-
-        # If an asteroid hits a ship one life is removed
-        if ship.get_mask().colliderect(asteroid.get_mask()):
-            lives.pop()
-            if asteroid not in remasteroids:
-                remasteroids.append(asteroid)
-
-    for heart in lives:
-        WIN.blit(HEART_IMG, heart)
-
-    # removes the collided bullets and asteroids
-    for asteroid in remasteroids:
-        asteroids.remove(asteroid)
-        ship.available_asteroids.remove(asteroid)
-    for bullet in rembullets:
-        ship.bullets.remove(bullet)
-
-    pygame.display.update()
-
-
-def key_update(keys, ship):
+    ship = world.ship
+
+    RENDERER.begin()
+    RENDERER.blit(SCORE_TEXT.get('Score: ' + str(ship.score)), (15, 15))
+    for line, (text, cache) in enumerate(zip(profiler.hud_lines(), HUD_TEXT)):
+        RENDERER.blit(cache.get(text), (WIN_WIDTH - 160, 15 + 20 * line))
+    profiler.mark('text')
+
+    for asteroid in world.asteroids:
+        x = asteroid.prev_x + (asteroid.x - asteroid.prev_x) * alpha
+        y = asteroid.prev_y + (asteroid.y - asteroid.prev_y) * alpha
+        RENDERER.blit(ASTEROID_SPRITES.get(asteroid.length, asteroid.angle), (x, y))
+
+    for bullet in ship.bullets:
+        y = bullet[1] + ship.BULLET_VELOCITY * (1 - alpha)
+        RENDERER.rect(BULLET_COLOR, (bullet[0], y, ship.BULLET_WIDTH, ship.BULLET_HEIGHT))
+    RENDERER.blit(SPACESHIP_IMG, (ship.prev_x + (ship.x - ship.prev_x) * alpha, ship.y))
+
+    for life in range(world.lives):
+        RENDERER.blit(HEART_IMG, (10 + 50 * life, 60))
+    profiler.mark('blit')
+
+    RENDERER.end()
+    profiler.mark('display')
+
+
+def key_update(keys):
     """
-    Checks for the key inputs and moves the spaceship accordingly
+    Checks for the key inputs
     :param keys: dictionary of keys pressed
-    :param ship: spaceship
-    :return: None
+    :return: (left, right, shoot)
     """
-    if keys[pygame.K_SPACE]:
-        ship.shoot()
-    if not ship.aimBot:
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-            ship.move_left()
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            ship.move_right()
+    return (keys[pygame.K_a] or keys[pygame.K_LEFT], keys[pygame.K_d] or keys[pygame.K_RIGHT],
+            keys[pygame.K_SPACE])
 
 
-def main():
+def main(max_speed=False, record_path=None, profiler=NULL_PROFILER):
     """
-    Main loop that runs the game and checks for key updates, gameover, etc.
+    Main loop that runs the game and checks for key updates, gameover, etc. The game advances in fixed ticks, as many
+    as the time since the last frame allows, and frames are drawn in between at their own rate
+    :param max_speed: runs ticks as fast as the computer can and only draws now and then, to fast-forward the aimbot
+    :param record_path: file the inputs of the game are recorded to so that it can be replayed with replay.py
+    :param profiler: FrameProfiler timing the phases of every frame, F3 shows or hides its HUD
     :return: 1 to restart else none
     """
-    fps = 60
+    init()
     clock = pygame.time.Clock()
     run = True
-    ship = Spaceship(100, 450)
-    count = 0
-    global asteroids
+    seed = random.randrange(2 ** 64)
+    world = GameWorld(seed, pilot=net.activate)
+    world.profiler = profiler
+    recorder = Recorder(seed) if record_path else None
+    accumulator = 0.0
+    previous = time.perf_counter()
+    RENDERER.invalidate()  # the game over or leaderboard screen may still be on the window
+    toggle_aimbot = False  # a press of N waits for the next tick, a frame may not run any
 
     while run:
-        clock.tick(fps)
-        count += 1
-        fps += 0.01  # We increment the fps so that the speed increases over time
-
+        profiler.begin()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
-            # If an asteroid goes out of the screen we pop the first asteroid in the list since it spawned first
-            if event.type == DEL_ASTEROID:
-                asteroid = asteroids.pop(0)
-                ship.available_asteroids.remove(asteroid)
-
-        keys = pygame.key.get_pressed()
-        key_update(keys, ship)
-
-        # Turns the aimbot on or off
-        if keys[pygame.K_n]:
-            if ship.aimBot:
-                ship.aimBot = False
-            else:
-                ship.aimBot = True
-
-        # Spawns a new asteroid every 80 frames and adds a life for every 100 points
-        if count == 80:
-            asteroids.append(Asteroid())
-            ship.available_asteroids.append(asteroids[-1])
-            count = 0
-            if ship.score % 100 == 0 and ship.score != 0 and len(lives) < 3:
-                x, y = lives[-1]
-                lives.append((x + 50, y))
-                count = 20
-        draw_window(ship, asteroids)
+            # Turns the aimbot on or off
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_n:
+                toggle_aimbot = True
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_hud()
+
+        left, right, shoot = key_update(pygame.key.get_pressed())
+        profiler.mark('events')
+
+        now = time.perf_counter()
+        if max_speed:
+            # Simulates for a whole frame worth of real time before drawing once
+            deadline = now + 1 / RENDER_FPS
+            while time.perf_counter() < deadline and not world.done:
+                world.step(left, right, shoot, toggle_aimbot)
+                if recorder is not None:
+                    recorder.record(left, right, shoot, toggle_aimbot)
+                toggle_aimbot = False
+            alpha = 1.0
+        else:
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            while accumulator >= 1 / world.tick_rate and not world.done:
+                accumulator -= 1 / world.tick_rate
+                world.step(left, right, shoot, toggle_aimbot)
+                if recorder is not None:
+                    recorder.record(left, right, shoot, toggle_aimbot)
+                toggle_aimbot = False
+            alpha = accumulator * world.tick_rate
+        previous = now
+
+        draw_window(world, alpha, profiler)
 
         # When lives run out we go to game over and the function ends
-        if len(lives) == 0:
-            return game_over(ship)
-
+        if world.done:
+            if recorder is not None:
+                recorder.save(record_path, world)
+            return game_over(world.ship)
+
+        if not max_speed:
+            clock.tick(RENDER_FPS)
+        profiler.mark('wait')
+        profiler.end()
+
+    if recorder is not None:
+        recorder.save(record_path, world)
+    profiler.close()
     pygame.quit()
     quit()
 
 
 if __name__ == '__main__':
-    run = True
+    parser = argparse.ArgumentParser(description='Space Invader')
+    parser.add_argument('--max-speed', action='store_true',
+                        help='run the game as fast as possible, e.g. to fast-forward the aimbot')
+    parser.add_argument('--record', metavar='PATH',
+                        help='record the inputs of the last game played to PATH, replay it with replay.py')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every phase of the frames and show their p50/p99 in milliseconds, F3 hides it')
+    parser.add_argument('--profile-csv', metavar='PATH', help='also write every frame of the profile to PATH')
+    args = parser.parse_args()
+
+    profiler = NULL_PROFILER
+    if args.profile or args.profile_csv:
+        profiler = FrameProfiler(csv_path=args.profile_csv)
 
-    while run:
-        asteroids = []
-        lives = [(10, 60), (60, 60), (110, 60)]
-        # lives = [(0,0)]
-        run = main()
+    run = True
+    try:
+        while run:
+            run = main(args.max_speed, args.record, profiler)
+    finally:
+        # A game left through the game over screen returns here without closing it
+        profiler.close()
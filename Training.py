@@ -1,344 +1,285 @@
-import math
+import argparse
+import functools
 import os
 import pickle
-import random
 
 import neat
 import pygame
 
-pygame.font.init()
-
-WIN_WIDTH, WIN_HEIGHT = 400, 600
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Space Invader")
+import assets
+from checkpoint import Checkpointer, latest, restore
+from distributed import AUTHKEY_ENV, DistributedEvaluator, parse_address
+from evaluation import FitnessCache, ParallelEvaluator, evaluate_genomes, evaluate_successive_halving
+from network import export
+from profiler import FrameProfiler, NULL_PROFILER
+from simulation import SimulationWorld, SPACESHIP_WIDTH, SPACESHIP_HEIGHT, WIN_WIDTH, WIN_HEIGHT
+from spectator import SnapshotWriter
+from telemetry import TelemetryReporter
 
 WHITE = (255, 255, 255)
 BULLET_COLOR = (255, 255, 0)
 FPS = 60
-SCORE_FONT = pygame.font.SysFont('comicsans', 30)
-DEL_ASTEROID = pygame.USEREVENT + 1
-
-SPACESHIP_HEIGHT = 50
-SPACESHIP_WIDTH = 69
-
-SPACESHIP_IMG = pygame.image.load(os.path.join('Assets', 'spaceship.png'))
-SPACESHIP_IMG = pygame.transform.scale(SPACESHIP_IMG, (SPACESHIP_WIDTH, SPACESHIP_HEIGHT))
-SPACESHIP_IMG = pygame.transform.rotate(SPACESHIP_IMG, 180)
-
-ASTEROID_IMG = pygame.image.load(os.path.join('Assets', 'asteroid.png'))
-BACKGROUND_IMG = pygame.image.load(os.path.join('Assets', 'space.png'))
-
-
-class Spaceship:
-    SPACESHIP_VELOCITY = 5
-    IMG = SPACESHIP_IMG
-
-    BULLET_VELOCITY = 5
-    BULLET_HEIGHT, BULLET_WIDTH = 10, 5
-    MAX_BULLETS = 3
-
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = SPACESHIP_WIDTH
-        self.height = SPACESHIP_HEIGHT
-        self.bullets = []
-        self.tick = 0
-        self.score = 0
-        self.available_asteroids = []
-
-    def move_right(self):
-        """
-        moves the spaceship right as long as its right side does not go out of the screen
-        :return: None
-        """
-        if self.x + self.SPACESHIP_VELOCITY + self.width < WIN_WIDTH:
-            self.x += self.SPACESHIP_VELOCITY
-            asteroid = self.available_asteroids[0]
-            '''x = asteroid.x + math.tan(asteroid.angle) * (self.y - asteroid.y)
-            if self.x - self.SPACESHIP_VELOCITY < x:
-                return 0.1 - (abs(self.x - x)) / 4000
-            else:
-                return -(0.1 - (abs(self.x - x)) / 4000)'''
-            x = asteroid.rect.center[0] + (
-                    (self.y - asteroid.rect.center[1]) / (1 + math.cos(asteroid.angle))) * math.sin(asteroid.angle)
-            # x = asteroid.rect.center[0]
-            if self.x - self.SPACESHIP_VELOCITY <= x:
-                return 0.1 - (abs(self.x - x)) / 4000
-            else:
-                return -(0.2 - (abs(self.x - x)) / 4000)
-        else:
-            return 0
-
-    def move_left(self):
-        """
-        Same thing as move right but checks that the spaceship does not go too far left outsdide
-        :return: None
-        """
-        if self.x - self.SPACESHIP_VELOCITY > 0:
-            self.x -= self.SPACESHIP_VELOCITY
-            asteroid = self.available_asteroids[0]
-            '''x = asteroid.x + math.tan(asteroid.angle) * (self.y - asteroid.y)
-            if self.x - self.SPACESHIP_VELOCITY > x:
-                return 0.1 - (abs(self.x - x)) / 4000
-            else:
-                return -(0.1 - (abs(self.x - x)) / 4000)'''
-            x = asteroid.rect.center[0] + (
-                    (self.y - asteroid.rect.center[1]) / (1 + math.cos(asteroid.angle))) * math.sin(asteroid.angle)
-            # x = asteroid.rect.center[0]
-            if self.x + self.SPACESHIP_VELOCITY >= x:
-                return 0.1 - (abs(self.x - x)) / 4000
-            else:
-                return -(0.2 - (abs(self.x - x)) / 4000)
-        else:
-            return 0
 
-    def shoot(self):
-        """
-        allows us to shoot a bullet only twice per second and a maximum number of bullets.
-        bullet is just a rectangle with bullet dimensions and starting position in the middle of the spaceship
-        :return: None
-        """
-        if self.tick >= 50:
-            if len(self.bullets) <= self.MAX_BULLETS:
-                bullet = pygame.Rect(self.x + self.width // 2, self.y - self.BULLET_HEIGHT, self.BULLET_WIDTH,
-                                     self.BULLET_HEIGHT)
-                self.bullets.append(bullet)
-                self.tick = 0
+# Set by init(), only a rendered training opens a window and loads the images
+WIN = None
+SCORE_FONT = TEXT_FONT = None
+SPACESHIP_IMG = ASTEROID_SPRITES = BACKGROUND_IMG = None
 
-    def draw(self):
-        """
-        makes a rectangle for the ship and blits it
-        checks through the bullets if any have gone above the screen and adds them to remove and deletes them afterward
-        otherwise it moves the bullet up and draws it
-        :return: None
-        """
-        ship_rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.tick += 1
 
-        for bullet in self.bullets:
-            bullet.y -= self.BULLET_VELOCITY
-            pygame.draw.rect(WIN, BULLET_COLOR, bullet)
-
-        WIN.blit(self.IMG, ship_rect.topleft)
-
-    def get_mask(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-
-    def __repr__(self):
-        return "Ship at " + str(self.x)
-
-
-class Asteroid:
-    VELOCITY = 5
+def init():
+    """
+    Opens the window and loads the fonts and images used to draw the training, only the first call does anything
+    :return: None
+    """
+    global WIN, SCORE_FONT, TEXT_FONT, SPACESHIP_IMG, ASTEROID_SPRITES, BACKGROUND_IMG
+    if WIN is not None:
+        return
 
-    def __init__(self):
-        """
-        sets up the asteroid. We take it to be a square with a random length and random starting position. We displace
-        it above by its length, so it starts from the top.
-        """
-        self.length = random.randrange(50, 100, 5)
-        self.x = random.randint(SPACESHIP_WIDTH // 2, WIN_WIDTH - SPACESHIP_WIDTH // 2)
-        self.y = -self.length
-        self.IMG = pygame.transform.scale(ASTEROID_IMG, (self.length, self.length))
-        self.target_x = random.randint(0, WIN_WIDTH)  # Random coordinate to go to
-        self.angle = math.atan((self.target_x - self.x) / (WIN_HEIGHT + self.length))  # gets an angle to aim
-        self.IMG = pygame.transform.rotate(self.IMG, self.angle)
-        self.rect = pygame.Rect(self.x, self.y, self.length, self.length)
+    pygame.font.init()
+    WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption("Space Invader")
 
-    def move(self):
-        """
-        Deletes the asteroid if it goes below the screen otherwise it moves the asteroid such that the angle is
-        maintained :return: None
-        """
-        if self.y > 450 + self.length:
-            pygame.event.post(pygame.event.Event(DEL_ASTEROID))
-        else:
-            self.x += self.VELOCITY * math.sin(self.angle)
-            self.y += self.VELOCITY * math.cos(self.angle)
-            self.rect = pygame.Rect(self.x, self.y, self.length, self.length)
-            WIN.blit(self.IMG, self.rect.topleft)
+    SCORE_FONT = pygame.font.SysFont('comicsans', 30)
+    TEXT_FONT = pygame.font.SysFont('comicsans', 20)
 
-    def get_mask(self):
-        """
-        :return: Rectangle of the asteroid to use for collisions
-        """
-        return pygame.Rect(self.x, self.y, self.length, self.length)
+    SPACESHIP_IMG = pygame.transform.scale(assets.image('spaceship.png'), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT))
+    SPACESHIP_IMG = pygame.transform.rotate(SPACESHIP_IMG, 180)
 
-    def __repr__(self):
-        return 'Asteroid ' + str(self.x)
+    ASTEROID_SPRITES = assets.asteroid_sprites()
+    BACKGROUND_IMG = assets.image('space.png')
 
 
-def draw_window(ships, asteroids, ge, nets):
+def draw_window(world, profiler=NULL_PROFILER):
     """
-    updates the window and checks for collisions between bullets and asteroids as well as asteroids and spaceship
-    then it increases/decreases the fitness and removes the bullets and asteroids that have collided and also the
-    spaceships and their neural networks also updates the score
-    :param ships: list of spaceships
-    :param asteroids: list of asteroids
-    :param ge: list of genomes
-    :param nets: list of neural networks
+    Draws the current state of a simulation world, the world is not changed so this can be skipped when nobody is
+    watching
+    :param world: SimulationWorld
+    :param profiler: FrameProfiler timing the drawing, its HUD is drawn on the right of the window
     :return: None
     """
-    global numasteroids
     WIN.blit(BACKGROUND_IMG, (0, 0))
-    score = SCORE_FONT.render('Score: ' + str(numasteroids), True, WHITE)
-    numShips = SCORE_FONT.render('Ships: ' + str(len(ships)), True, WHITE)
-    WIN.blit(score, (10, 10))
-    WIN.blit(numShips, (10, 45))
 
-    for asteroid in asteroids:
-        asteroid.move()
-    for ship in ships:  # moves each ship
-        ship.draw()
-
-    for asteroid in asteroids:
-        rembullets = []
-        remship = []
-        # remasteroids = []
-        for x, ship in enumerate(ships):
-            rembullets.append([])
+    for asteroid in world.asteroids:
+        WIN.blit(ASTEROID_SPRITES.get(asteroid.length, asteroid.angle), asteroid.get_mask()[:2])
+    for ship in world.ships:
+        if ship.alive:
             for bullet in ship.bullets:
-                if bullet.colliderect(asteroid.get_mask()) and asteroid in ship.available_asteroids:
-                    ship.score += 1
-                    ge[x].fitness += 5
-                    ship.available_asteroids.remove(asteroid)
-                    # remasteroids.append(asteroid)
-                    rembullets[-1].append(bullet)
-
-            if ship.get_mask().colliderect(asteroid.get_mask()) and asteroid in ship.available_asteroids:
-                ship.score -= 5
-                ge[x].fitness -= 4
-                remship.append(x)
-
-        # for asteroid in remasteroids:
-        #    asteroids.remove(asteroid)
-        for x in remship[::-1]:  # we remove in reverse so that the indexes don't change
-            ge.pop(x)
-            ships.pop(x)
-            nets.pop(x)
-            rembullets.pop(x)
+                pygame.draw.rect(WIN, BULLET_COLOR, ship.bullet_mask(bullet))
+            WIN.blit(SPACESHIP_IMG, (ship.x, ship.y))
 
-        for index, group in enumerate(rembullets):  # Remove bullets for each spaceship
-            if group:
-                for bullet in group:
-                    if bullet:
-                        ships[index].bullets.remove(bullet)
-
-        for x, ship in enumerate(ships):
-            for bullet in ship.bullets:
-                if bullet.y < -ship.BULLET_HEIGHT:
-                    ship.bullets.remove(bullet)
-                    ge[x].fitness -= 0.1
+    score = SCORE_FONT.render('Score: ' + str(world.num_asteroids), True, WHITE)
+    numShips = SCORE_FONT.render('Ships: ' + str(world.alive), True, WHITE)
+    WIN.blit(score, (10, 10))
+    WIN.blit(numShips, (10, 45))
+    for line, text in enumerate(profiler.hud_lines()):
+        WIN.blit(TEXT_FONT.render(text, True, WHITE), (WIN_WIDTH - 160, 10 + 20 * line))
+    profiler.mark('draw')
 
     pygame.display.update()
+    profiler.mark('display')
 
 
-numasteroids = 0
-
-
-def main(genomes, config):
-    global numasteroids
-    numasteroids = 0
-    ships = []
+def main(genomes, config, render=False, profiler=NULL_PROFILER, halving=False, seed=None, cache=None,
+         spectator=None, stats=None):
+    """
+    Evaluates a generation: every genome drives one spaceship in a shared world and its fitness is what the world gave
+    its ship. Without rendering the faster population world is used
+    :param genomes: list of (genome id, genome)
+    :param config: neat configuration
+    :param render: draws every frame in the window when True
+    :param profiler: FrameProfiler timing the phases of every frame, its percentiles are printed after the generation
+    :param halving: only lets the best ships of short episodes play longer ones, see evaluate_successive_halving,
+    not when rendering
+    :param seed: seed of the asteroids, None for new asteroids every generation
+    :param cache: FitnessCache the genomes are looked up in before they are simulated, needs a seed, not when rendering
+    :param spectator: SnapshotWriter publishing the world for spectator.py, when not rendering
+    :param stats: dictionary the simulated ship-frames are added to, e.g. the one of a TelemetryReporter
+    :return: None
+    """
+    if not render:
+        if halving:
+            stats = {} if stats is None else stats
+            fitnesses = evaluate_successive_halving([g for _, g in genomes], config, seed, profiler=profiler,
+                                                    stats=stats, spectator=spectator)
+            print('Simulated {ship_frames} ship-frames, spared at most {spared_ship_frames}'.format(**stats))
+        elif cache is not None:
+            fitnesses = cache.evaluate(functools.partial(evaluate_genomes, profiler=profiler, spectator=spectator,
+                                                         stats=stats), [g for _, g in genomes], config, seed)
+        else:
+            fitnesses = evaluate_genomes([g for _, g in genomes], config, seed, profiler, spectator, stats)
+        for (_, g), fitness in zip(genomes, fitnesses):
+            g.fitness = fitness
+        if profiler.enabled:
+            print(profiler.report())
+        return
+
+    init()
     nets = []
     ge = []
 
     for _, g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-        nets.append(net)
-        ships.append(Spaceship(200, 450))
+        nets.append(neat.nn.FeedForwardNetwork.create(g, config))
         g.fitness = 0
         ge.append(g)
 
-    pygame.time.Clock()
-    run = True
-    asteroids = []
-    count = 0
-    while run:
-        # clock.tick(FPS)
-        count += 1
-
-        for x, g in enumerate(ge):
-            # g.fitness += 0.005
-            if g.fitness <= -100:
-                g.fitness -= 10
-                ships.pop(x)
-                nets.pop(x)
-                ge.pop(x)
-            else:
-                if ships[x].available_asteroids:
-                    asteroid = ships[x].available_asteroids[0]
-                    output = nets[x].activate((asteroid.rect.center[0], asteroid.rect.center[1],
-                                               asteroid.angle, ships[x].x, ships[x].y))
-
-                    if output[0] > 0:
-                        # g.fitness += ships[x].move_right()
-                        ships[x].move_right()
-                    elif output[0] < 0:
-                        # g.fitness += ships[x].move_left()
-                        ships[x].move_left()
-                    if output[1] <= 0:
-                        ships[x].shoot()
-
+    world = SimulationWorld(len(ge), seed)
+    world.profiler = profiler
+    while not world.done:
+        if stats is not None:
+            stats['ship_frames'] = stats.get('ship_frames', 0) + world.alive
+        profiler.begin()
+        actions = [nets[x].activate(obs) if obs is not None else None for x, obs in enumerate(world.observe())]
+        profiler.mark('activate')
+        world.step(actions)
+
+        draw_window(world, profiler)
         for event in pygame.event.get():
-            if event.type == DEL_ASTEROID:
-                asteroid = asteroids.pop(0)
-                for x, ship in enumerate(ships):
-                    if asteroid in ship.available_asteroids:
-                        ship.available_asteroids.remove(asteroid)
-                        ge[x].fitness -= 2
-                        ships.pop(x)
-                        ge.pop(x)
-                        nets.pop(x)
-
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_hud()
             if event.type == pygame.QUIT:
-                g = []
-                for gen in ge:
-                    g.append(gen.fitness)
-
-                dot = ge[g.index(max(g))]
+                dot = ge[world.fitness.index(max(world.fitness))]
                 with open('neuralNetworkc', 'wb') as f:
                     pickle.dump(dot, f)
+                profiler.close()
                 quit()
-                run = False
+        profiler.mark('events')
+        profiler.end()
 
-        if count >= 80:
-            asteroid = Asteroid()
-            asteroids.append(asteroid)
-            numasteroids += 1
-            for ship in ships:
-                ship.available_asteroids.append(asteroid)
-            count = 0
-        draw_window(ships, asteroids, ge, nets)
-        if len(ships) <= 0:
-            run = False
-            break
-        if numasteroids > 1500:
-            break
+    for x, g in enumerate(ge):
+        g.fitness = world.fitness[x]
 
 
-def run(config_path):
+def run(config_path, render=False, workers=0, profiler=NULL_PROFILER, resume=None, checkpoint_every=10,
+        checkpoint_seconds=300, halving=False, coordinator=None, authkey=None, seed=None, spectate=False,
+        telemetry=None, telemetry_genomes=False):
     """
     RUns neat and evolves the neural network as per the configurations
-    finds the best nn and pickles it
+    finds the best nn and pickles it. The run is checkpointed as it goes and the best genome so far is kept in
+    neuralNetworkc
     :param config_path: fiole path to configuration file
+    :param render: shows the training in the window
+    :param workers: number of worker processes evaluating the genomes, 0 evaluates them in this process
+    :param profiler: FrameProfiler timing the frames evaluated in this process, workers are not profiled
+    :param resume: checkpoint to carry on from instead of starting a new population, 'latest' for the newest one
+    :param checkpoint_every: generations between two checkpoints
+    :param checkpoint_seconds: seconds between two checkpoints
+    :param halving: evaluates the genomes with successive halving instead of full episodes
+    :param coordinator: (host, port) to listen on for the workers of distributed.py, they evaluate all the genomes
+    :param authkey: key the workers of distributed.py must know, None for a random one that is printed
+    :param seed: plays the asteroids of this seed every generation instead of new ones, and then does not simulate
+    again the genomes whose fitness is already known unless halving
+    :param spectate: publishes the generations evaluated in this process for spectator.py to show
+    :param telemetry: prefix of the telemetry logs appended to every generation, None for no telemetry
+    :param telemetry_genomes: also logs every genome in the telemetry
     :return: None
     """
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                                config_path)
-    p = neat.Population(config)
+    if resume == 'latest':
+        resume = latest()
+    if resume:
+        p, stats = restore(resume)
+        stats = stats or neat.StatisticsReporter()
+    else:
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_path)
+        p = neat.Population(config)
+        stats = neat.StatisticsReporter()
     p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
     p.add_reporter(stats)
-
-    winner = p.run(main, 500)
+    checkpointer = Checkpointer(stats, checkpoint_every, checkpoint_seconds, best=p.best_genome,
+                                generation=p.generation)
+    p.add_reporter(checkpointer)
+    # The window shows every genome for the whole episode, so the evaluation shortcuts do not apply to it
+    rendering = render and not workers and not coordinator
+    if rendering and halving:
+        print('--render plays every genome for the whole episode, --halving is ignored')
+        halving = False
+    cache = None
+    if seed is not None and not halving:
+        if rendering:
+            print('--render plays every genome again, --seed only keeps the same asteroids every generation')
+        else:
+            cache = FitnessCache()
+            p.add_reporter(cache)
+    spectator = None
+    if spectate:
+        if workers or coordinator:
+            print('Only generations evaluated in this process can be watched, not the ones of the workers')
+        else:
+            spectator = SnapshotWriter()
+            p.add_reporter(spectator)
+    telemetry_reporter = None
+    counters = None
+    if telemetry:
+        telemetry_reporter = TelemetryReporter(telemetry, telemetry_genomes)
+        p.add_reporter(telemetry_reporter)
+        counters = telemetry_reporter.stats
+
+    generations = 500 - p.generation
+    evaluator = None
+    try:
+        function = evaluate_successive_halving if halving else evaluate_genomes
+        if coordinator:
+            evaluator = DistributedEvaluator(coordinator, authkey, function=function, seed=seed, cache=cache,
+                                             stats=counters)
+            winner = p.run(evaluator.evaluate, generations)
+        elif workers:
+            evaluator = ParallelEvaluator(workers, function=function, seed=seed, cache=cache, stats=counters)
+            winner = p.run(evaluator.evaluate, generations)
+        else:
+            winner = p.run(functools.partial(main, render=render, profiler=profiler, halving=halving, seed=seed,
+                                             cache=cache, spectator=spectator, stats=counters), generations)
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+        profiler.close()
+        if spectator is not None:
+            spectator.close()
+        if telemetry_reporter is not None:
+            telemetry_reporter.close()
+        # Last, it raises if a checkpoint could not be written
+        checkpointer.close()
     with open('neuralNetwork1', 'wb') as f:
         pickle.dump(winner, f)
+    export(winner, p.config, 'neuralNetwork1.net')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trains the aimbot with NEAT')
+    parser.add_argument('--render', action='store_true', help='draw every frame of the training')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='evaluate the genomes in this many worker processes without a window')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every phase of the frames, printed after each generation and shown when rendering')
+    parser.add_argument('--resume', metavar='CHECKPOINT',
+                        help="carry on a run from one of its checkpoints, 'latest' for the newest")
+    parser.add_argument('--checkpoint-every', type=int, default=10, metavar='GENERATIONS',
+                        help='generations between two checkpoints')
+    parser.add_argument('--checkpoint-seconds', type=float, default=300,
+                        help='seconds between two checkpoints, whichever of the two comes first')
+    parser.add_argument('--profile-csv', metavar='PATH', help='also write every frame of the profile to PATH')
+    parser.add_argument('--halving', action='store_true',
+                        help='give every genome a short episode and only the best ones longer episodes')
+    parser.add_argument('--coordinator', type=parse_address, metavar='HOST:PORT',
+                        help='listen on HOST:PORT and let workers started with distributed.py evaluate the genomes')
+    parser.add_argument('--authkey', default=os.environ.get(AUTHKEY_ENV),
+                        help='key the workers must know, ' + AUTHKEY_ENV + ' by default, else a random one is printed')
+    parser.add_argument('--spectate', action='store_true',
+                        help='let spectator.py show the training from another process, without slowing it down')
+    parser.add_argument('--seed', type=int,
+                        help='play the same asteroids every generation and reuse the fitness of unchanged genomes')
+    parser.add_argument('--telemetry', nargs='?', const='telemetry', metavar='PREFIX',
+                        help='append the statistics of every generation to PREFIX.generations, read with telemetry.py')
+    parser.add_argument('--telemetry-genomes', action='store_true',
+                        help='with --telemetry, also append every genome to PREFIX.genomes')
+    args = parser.parse_args()
+
+    profiler = NULL_PROFILER
+    if args.profile or args.profile_csv:
+        profiler = FrameProfiler(csv_path=args.profile_csv)
+
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    run(config_path)
+    run(config_path, args.render, args.workers, profiler, args.resume, args.checkpoint_every, args.checkpoint_seconds,
+        args.halving, args.coordinator, args.authkey and args.authkey.encode(), args.seed, args.spectate,
+        args.telemetry, args.telemetry_genomes)
@@ -0,0 +1,81 @@
+"""
+Caches for the images of the game so that nothing has to be scaled or rotated while a frame is being played. Images,
+sprites and networks are only loaded the first time they are asked for and then kept, so importing the game modules
+does not touch the disk and a process that never draws never loads them.
+"""
+import functools
+import os
+from collections import OrderedDict
+
+import pygame
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(LOCAL_DIR, 'Assets')
+
+
+@functools.lru_cache(maxsize=None)
+def image(name):
+    """
+    :param name: file name in the Assets folder
+    :return: the image as it is on disk, shared by every caller so it must not be drawn on
+    """
+    return pygame.image.load(os.path.join(ASSETS_DIR, name))
+
+
+@functools.lru_cache(maxsize=None)
+def asteroid_sprites():
+    """
+    :return: the AsteroidSprites cache of asteroid.png
+    """
+    return AsteroidSprites(image('asteroid.png'))
+
+
+@functools.lru_cache(maxsize=None)
+def model(name='neuralNetwork.net'):
+    """
+    :param name: network file next to the game, written by network.py
+    :return: CompiledNetwork
+    """
+    import network
+
+    return network.load(os.path.join(LOCAL_DIR, name))
+
+
+class AsteroidSprites:
+    """
+    Scaled and rotated asteroid surfaces keyed by size and quantized angle. Asteroid sizes come from
+    random.randrange(50, 100, 5) and their angles are bounded, so only about a hundred and fifty distinct sprites
+    exist. They are made the first time they are needed and the least recently used one is dropped once the cache
+    is full.
+    """
+    ANGLE_STEP = 0.1
+    MAX_SPRITES = 160
+
+    def __init__(self, image, max_sprites=MAX_SPRITES):
+        """
+        :param image: asteroid image at its original size
+        :param max_sprites: number of sprites kept at most
+        """
+        self.image = image
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()
+
+    def get(self, length, angle):
+        """
+        :param length: side of the asteroid
+        :param angle: angle of the asteroid
+        :return: surface of the asteroid
+        """
+        key = (length, round(angle / self.ANGLE_STEP))
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.transform.scale(self.image, (length, length))
+            sprite = pygame.transform.rotate(sprite, key[1] * self.ANGLE_STEP)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.max_sprites:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
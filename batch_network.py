@@ -0,0 +1,137 @@
+"""
+Population-wide feed forward inference. Instead of walking every neat.nn.FeedForwardNetwork node by node, the networks
+of a whole generation are compiled once into flat index and weight arrays. All genomes share one value buffer where each
+genome owns a block of slots, and the nodes of every genome at the same depth are evaluated together, so a forward
+pass of the population is a few NumPy calls per layer.
+"""
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+# NumPy versions of the activation functions in neat.activations
+ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.maximum(z, 0.0),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'abs': np.abs,
+    'square': np.square,
+    'cube': lambda z: z ** 3,
+}
+
+
+def flatten_genome(genome, config):
+    """
+    Orders the expressed nodes of a genome the same way neat.nn.FeedForwardNetwork.create does
+    :param genome: neat genome
+    :param config: neat configuration
+    :return: list of layers, each a list of (node, activation, aggregation, bias, response, [(input node, weight)])
+    """
+    genome_config = config.genome_config
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    layers = feed_forward_layers(genome_config.input_keys, genome_config.output_keys, connections)
+
+    flat = []
+    for layer in layers:
+        node_evals = []
+        for node in layer:
+            links = [(i, genome.connections[(i, o)].weight) for i, o in connections if o == node]
+            ng = genome.nodes[node]
+            node_evals.append((node, ng.activation, ng.aggregation, ng.bias, ng.response, links))
+        flat.append(node_evals)
+    return flat
+
+
+class BatchNetwork:
+    """
+    The networks of a list of genomes compiled into flat per-depth tables
+    """
+
+    def __init__(self, genomes, config):
+        """
+        :param genomes: list of genomes, row i of the inputs and outputs belongs to genome i
+        :param config: neat configuration
+        """
+        input_keys = config.genome_config.input_keys
+        output_keys = config.genome_config.output_keys
+
+        self.input_slots = np.zeros((len(genomes), len(input_keys)), dtype=np.int64)
+        self.output_slots = np.zeros((len(genomes), len(output_keys)), dtype=np.int64)
+        layers = []
+        size = 0
+
+        for row, genome in enumerate(genomes):
+            slots = {}
+            for key in list(input_keys) + list(output_keys):
+                slots[key] = size
+                size += 1
+            self.input_slots[row] = [slots[key] for key in input_keys]
+            self.output_slots[row] = [slots[key] for key in output_keys]
+
+            for depth, node_evals in enumerate(flatten_genome(genome, config)):
+                if depth == len(layers):
+                    layers.append([])
+                for node, activation, aggregation, bias, response, links in node_evals:
+                    if aggregation != 'sum':
+                        raise ValueError('BatchNetwork only supports sum aggregation, not ' + aggregation)
+                    if node not in slots:
+                        slots[node] = size
+                        size += 1
+                    layers[depth].append((slots[node], activation, bias, response,
+                                          [(slots[i], w) for i, w in links]))
+
+        self.size = size
+        self.layers = [self._compile(layer) for layer in layers]
+
+    @staticmethod
+    def _compile(layer):
+        """
+        Turns the nodes of one depth into arrays
+        :param layer: list of (slot, activation, bias, response, [(input slot, weight)])
+        :return: dictionary of arrays describing the layer
+        """
+        sources, targets, weights = [], [], []
+        for index, (_, _, _, _, links) in enumerate(layer):
+            for slot, w in links:
+                sources.append(slot)
+                targets.append(index)
+                weights.append(w)
+
+        activations = {}
+        for index, (_, activation, _, _, _) in enumerate(layer):
+            if activation not in ACTIVATIONS:
+                raise ValueError('BatchNetwork does not support the activation ' + activation)
+            activations.setdefault(activation, []).append(index)
+
+        return {
+            'slots': np.array([node[0] for node in layer], dtype=np.int64),
+            'bias': np.array([node[2] for node in layer]),
+            'response': np.array([node[3] for node in layer]),
+            'sources': np.array(sources, dtype=np.int64),
+            'targets': np.array(targets, dtype=np.int64),
+            'weights': np.array(weights),
+            'activations': [(ACTIVATIONS[name], np.array(indices)) for name, indices in activations.items()],
+        }
+
+    def activate(self, inputs):
+        """
+        Runs every network on its row of inputs
+        :param inputs: (N, num_inputs) array
+        :return: (N, num_outputs) array
+        """
+        values = np.zeros(self.size)
+        values[self.input_slots] = inputs
+
+        for layer in self.layers:
+            sums = np.bincount(layer['targets'], weights=values[layer['sources']] * layer['weights'],
+                               minlength=len(layer['slots']))
+            z = layer['bias'] + layer['response'] * sums
+            if len(layer['activations']) == 1:
+                values[layer['slots']] = layer['activations'][0][0](z)
+            else:
+                for function, indices in layer['activations']:
+                    values[layer['slots'][indices]] = function(z[indices])
+
+        return values[self.output_slots]
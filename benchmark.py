@@ -0,0 +1,327 @@
+"""
+Benchmarks of the hot paths of the game and the trainer. Everything runs from fixed seeds and the results are written as
+JSON together with the commit they were measured on, so reports from different commits can be compared directly.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --only world collision
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import neat
+import numpy as np
+
+from batch_network import BatchNetwork
+from evaluation import evaluate_genomes, evaluate_successive_halving
+from network import load
+from population import PopulationWorld
+from simulation import Asteroid, SimulationWorld, WIN_WIDTH
+from vecenv import VectorEnv
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED = 1234
+
+
+def load_config():
+    """
+    :return: neat configuration of the project
+    """
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              os.path.join(LOCAL_DIR, 'config-feedforward.txt'))
+
+
+def load_genome():
+    """
+    :return: the trained genome shipped with the game
+    """
+    with open(os.path.join(LOCAL_DIR, 'neuralNetwork'), 'rb') as f:
+        return pickle.load(f)
+
+
+def bench_world(config, sizes, frames):
+    """
+    Frames per second of a Training style world where every ship is flown by the shipped network with some noise so
+    the ships do not all behave the same. Only world.step is timed, the network is measured separately
+    :param config: neat configuration
+    :param sizes: numbers of ships
+    :param frames: frames simulated per size
+    :return: dictionary of results per engine and size
+    """
+    genome = load_genome()
+    results = {}
+    for engine in (PopulationWorld, SimulationWorld):
+        for size in sizes:
+            if engine is SimulationWorld and size > 1000:
+                continue  # takes minutes and says nothing the smaller sizes do not
+            net = BatchNetwork([genome] * size, config)
+            noise = np.random.default_rng(SEED)
+            world = engine(size, SEED)
+            elapsed = 0.0
+            for frame in range(frames):
+                if world.done:
+                    world.reset(SEED + frame)
+                if engine is PopulationWorld:
+                    observations, active = world.observe()
+                else:
+                    rows = world.observe()
+                    active = np.array([row is not None for row in rows])
+                    observations = np.array([row if row is not None else (0,) * 5 for row in rows], dtype=float)
+                actions = net.activate(observations) + noise.normal(0, 0.5, (size, 2))
+                if engine is SimulationWorld:
+                    actions = [tuple(a) if on else None for a, on in zip(actions, active)]
+                start = time.perf_counter()
+                world.step(actions)
+                elapsed += time.perf_counter() - start
+            results[engine.__name__ + '/' + str(size)] = {'ships': size, 'frames': frames,
+                                                          'frames_per_second': frames / elapsed}
+    return results
+
+
+def bench_vecenv(sizes, steps, workers=0):
+    """
+    Environment steps per second of VectorEnv with random actions, worlds that end are reset as they would be when
+    training
+    :param sizes: numbers of worlds
+    :param steps: calls of step() per size
+    :param workers: worker processes of the env
+    :return: dictionary of results per size
+    """
+    results = {}
+    for size in sizes:
+        env = VectorEnv(size, workers)
+        env.reset(list(range(SEED, SEED + size)))
+        actions = np.random.default_rng(SEED).normal(size=(steps, size, 2))
+        start = time.perf_counter()
+        for step in range(steps):
+            env.step(actions[step])
+        elapsed = time.perf_counter() - start
+        env.close()
+        results[str(size)] = {'worlds': size, 'workers': workers, 'steps_per_second': steps * size / elapsed}
+    return results
+
+
+def bench_generation(config):
+    """
+    Genomes evaluated per second for one generation of a fresh population
+    :param config: neat configuration
+    :return: dictionary of results
+    """
+    import random
+    random.seed(SEED)
+    population = neat.Population(config)
+    genomes = list(population.population.values())
+    start = time.perf_counter()
+    evaluate_genomes(genomes, config, SEED)
+    elapsed = time.perf_counter() - start
+    return {'genomes': len(genomes), 'seconds': elapsed, 'genomes_per_second': len(genomes) / elapsed}
+
+
+def bench_halving(config, size):
+    """
+    Compares successive halving with full episodes on mutated copies of the shipped genome: ship-frames simulated,
+    time and how good the fifth of the genomes it ranks best really are, 1 meaning as good as the true best fifth
+    :param config: neat configuration
+    :param size: number of genomes
+    :return: dictionary of results
+    """
+    import random
+    rng = random.Random(SEED)
+    random.seed(SEED)
+    genomes = []
+    for key in range(size):
+        genome = copy.deepcopy(load_genome())
+        genome.key = key
+        for _ in range(rng.randrange(1, 10)):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+
+    results = {}
+    fitness = {}
+    for name, keep in (('full', 1.0), ('halving', 0.5)):
+        stats = {}
+        start = time.perf_counter()
+        fitness[name] = np.array(evaluate_successive_halving(genomes, config, SEED, keep=keep, stats=stats))
+        results[name] = {'seconds': time.perf_counter() - start, 'ship_frames': stats['ship_frames']}
+
+    best = size // 5
+    selected = np.argsort(-fitness['halving'], kind='stable')[:best]
+    results['frames_saved'] = 1 - results['halving']['ship_frames'] / results['full']['ship_frames']
+    results['selection_quality'] = fitness['full'][selected].mean() / np.sort(fitness['full'])[-best:].mean()
+    return results
+
+
+def bench_activate(config, number):
+    """
+    Latency of one call of the shipped network, with the generic neat class, the exported network the game loads and
+    the batched one on one row
+    :param config: neat configuration
+    :param number: calls timed
+    :return: dictionary of results
+    """
+    genome = load_genome()
+    inputs = (200.0, 150.0, 0.1, 200.0, 450.0)
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    compiled = load(os.path.join(LOCAL_DIR, 'neuralNetwork.net'))
+    batch = BatchNetwork([genome], config)
+    row = np.array([inputs])
+    return {
+        'FeedForwardNetwork_us': timeit.timeit(lambda: net.activate(inputs), number=number) / number * 1e6,
+        'CompiledNetwork_us': timeit.timeit(lambda: compiled.activate(inputs), number=number) / number * 1e6,
+        'BatchNetwork_row_us': timeit.timeit(lambda: batch.activate(row), number=number) / number * 1e6,
+    }
+
+
+def scatter(world, rng, num_asteroids, bullets_per_ship):
+    """
+    Puts asteroids and bullets at random places in a world so collisions can be timed at a given density
+    :param world: SimulationWorld or PopulationWorld right after a reset
+    :param rng: random.Random
+    :param num_asteroids: asteroids on screen
+    :param bullets_per_ship: bullets of every ship
+    :return: None
+    """
+    for _ in range(num_asteroids):
+        asteroid = world.asteroids.spawn(Asteroid(rng), 0)
+        asteroid.y = rng.uniform(-100, 500)
+        asteroid.sync_rect()
+        if isinstance(world, PopulationWorld):
+            world.available[:, asteroid.slot] = True
+        else:
+            for ship in world.ships:
+                ship.available |= 1 << asteroid.slot
+
+    for x in range(world.num_ships):
+        ship_x = rng.randrange(5, WIN_WIDTH - 70, 5)
+        bullets = [[ship_x + 34, rng.randrange(-10, 440)] for _ in range(bullets_per_ship)]
+        if isinstance(world, PopulationWorld):
+            world.ship_x[x] = ship_x
+            for slot, (bullet_x, bullet_y) in enumerate(bullets):
+                world.bullet_x[x, slot], world.bullet_y[x, slot] = bullet_x, bullet_y
+                world.bullet_valid[x, slot] = True
+        else:
+            ship = world.ships[x]
+            ship.x = ship_x
+            ship.clear_bullets()
+            for bullet_x, bullet_y in bullets:
+                bullet = ship.spare.pop()
+                bullet[0], bullet[1] = bullet_x, bullet_y
+                ship.bullets.append(bullet)
+
+
+def bench_collision(ships, densities, repeats):
+    """
+    Time of the collision phase alone for different numbers of asteroids and bullets
+    :param ships: ships in the world
+    :param densities: list of (asteroids, bullets per ship)
+    :param repeats: collision phases timed per density, each on a freshly scattered world
+    :return: dictionary of results per engine and density
+    """
+    import random
+    results = {}
+    for engine in (PopulationWorld, SimulationWorld):
+        for num_asteroids, bullets in densities:
+            rng = random.Random(SEED)
+            world = engine(ships, SEED)
+            elapsed = 0.0
+            for _ in range(repeats):
+                world.reset(SEED)
+                scatter(world, rng, num_asteroids, bullets)
+                start = time.perf_counter()
+                world.collide()
+                elapsed += time.perf_counter() - start
+            results[engine.__name__ + '/' + str(num_asteroids) + 'x' + str(bullets)] = {
+                'ships': ships, 'asteroids': num_asteroids, 'bullets_per_ship': bullets,
+                'milliseconds': elapsed / repeats * 1e3}
+    return results
+
+
+def bench_draw(frames):
+    """
+    Frame time of Game.draw_window under the dummy SDL video driver, with the aimbot playing
+    :param frames: frames drawn
+    :return: dictionary of results
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import Game
+    from simulation import GameWorld
+
+    Game.init()
+    world = GameWorld(SEED, Game.net.activate)
+    world.ship.aimBot = True
+    elapsed = 0.0
+    for _ in range(frames):
+        if world.done:
+            world.reset(SEED)
+            world.ship.aimBot = True
+        world.step()
+        start = time.perf_counter()
+        Game.draw_window(world, 0.5)
+        elapsed += time.perf_counter() - start
+    return {'frames': frames, 'milliseconds_per_frame': elapsed / frames * 1e3}
+
+
+def commit():
+    """
+    :return: hash of the checked out commit, None outside of a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=LOCAL_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(only=None, quick=False):
+    """
+    Runs the benchmarks, a benchmark that fails is reported with its error instead of stopping the others
+    :param only: names of the benchmarks to run, all of them by default
+    :param quick: smaller sizes for a fast sanity check
+    :return: report dictionary
+    """
+    config = load_config()
+    benchmarks = {
+        'world': lambda: bench_world(config, (100, 1000) if quick else (100, 1000, 10000), 100 if quick else 500),
+        'vecenv': lambda: bench_vecenv((64, 1024) if quick else (64, 1024, 16384), 50 if quick else 300),
+        'generation': lambda: bench_generation(config),
+        'halving': lambda: bench_halving(config, 100 if quick else 500),
+        'activate': lambda: bench_activate(config, 2000 if quick else 20000),
+        'collision': lambda: bench_collision(100 if quick else 1000, ((2, 1), (4, 2), (8, 4), (16, 4)),
+                                             20 if quick else 100),
+        'draw': lambda: bench_draw(200 if quick else 2000),
+    }
+
+    report = {'commit': commit(), 'python': platform.python_version(), 'numpy': np.__version__,
+              'quick': quick, 'seed': SEED, 'benchmarks': {}}
+    for name, benchmark in benchmarks.items():
+        if only and name not in only:
+            continue
+        try:
+            report['benchmarks'][name] = benchmark()
+        except Exception as error:  # report it and carry on with the other benchmarks
+            report['benchmarks'][name] = {'error': repr(error)}
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the simulation, collisions, inference and rendering')
+    parser.add_argument('--only', nargs='+', help='benchmarks to run',
+                        choices=['world', 'vecenv', 'generation', 'halving', 'activate', 'collision', 'draw'])
+    parser.add_argument('--quick', action='store_true', help='smaller sizes for a fast sanity check')
+    parser.add_argument('--output', help='file the JSON report is written to, printed otherwise')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args.only, args.quick), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
@@ -0,0 +1,63 @@
+"""
+Uniform grid broadphase for the collision checks. Asteroids are put in the cells of the playfield they cover every
+frame, and bullets and ships only look at the asteroids in their own cells, so the exact rectangle test is only run on
+pairs that can actually touch.
+"""
+
+
+class SpatialHash:
+    """
+    Grid of square cells over the playfield, cells are only made for the places something has been inserted
+    """
+
+    def __init__(self, cell_size=100):
+        """
+        :param cell_size: side of a cell, about the size of the largest asteroid works best
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        """
+        empties the grid before the positions of a new frame are inserted
+        :return: None
+        """
+        self.cells.clear()
+
+    def cover(self, rect):
+        """
+        :param rect: (x, y, width, height) or pygame.Rect
+        :return: keys of the cells the rectangle overlaps
+        """
+        x, y, w, h = rect
+        size = self.cell_size
+        return [(cx, cy) for cx in range(int(x) // size, int(x + w - 1) // size + 1)
+                for cy in range(int(y) // size, int(y + h - 1) // size + 1)]
+
+    def insert(self, item, rect):
+        """
+        :param item: object to find back, e.g. an asteroid
+        :param rect: rectangle of the object
+        :return: None
+        """
+        for key in self.cover(rect):
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = [item]
+            else:
+                cell.append(item)
+
+    def query(self, rect, found=None):
+        """
+        Finds the objects that might collide with a rectangle
+        :param rect: rectangle to test
+        :param found: set the candidates are added to, lets several rectangles share one query
+        :return: set of the objects in the cells the rectangle overlaps
+        """
+        if found is None:
+            found = set()
+        for key in self.cover(rect):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        return found
@@ -0,0 +1,193 @@
+"""
+Checkpoints of NEAT training runs. The population is snapshotted at the end of a generation and the snapshot is
+compressed and written by a background thread, so evaluation does not wait on the disk. Files are written next to
+their final name and renamed over it, so a crash in the middle of a write never leaves a broken checkpoint behind. A
+write that fails, e.g. on a full disk, is raised in the training thread at the end of the next generation.
+"""
+import glob
+import gzip
+import itertools
+import os
+import pickle
+import queue
+import random
+import threading
+import time
+
+import neat
+from neat.reporting import BaseReporter
+
+CHECKPOINT_VERSION = 1
+
+
+def write_atomic(path, data):
+    """
+    Writes bytes to a temporary file next to path and renames it over path once it is on disk
+    :param path: file to write
+    :param data: bytes
+    :return: None
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Checkpointer(BaseReporter):
+    """
+    Reporter that saves the whole state of a run every few generations or minutes, whichever comes first, and keeps
+    the best genome found so far up to date on disk
+    """
+
+    def __init__(self, stats=None, generation_interval=10, time_interval=300, prefix='neat-checkpoint-', keep=3,
+                 best_path='neuralNetworkc', best=None, generation=0):
+        """
+        :param stats: StatisticsReporter saved along with the population so plots survive a resume
+        :param generation_interval: generations between two checkpoints, None to only use the time
+        :param time_interval: seconds between two checkpoints, None to only use the generations
+        :param prefix: checkpoints are written to prefix + generation
+        :param keep: number of checkpoints kept on disk, older ones are deleted
+        :param best_path: file the best genome is pickled to every time it improves, None to not export it
+        :param best: best genome of the run so far, the one restored with the population when resuming
+        :param generation: generation the run starts at, the one restored with the population when resuming
+        """
+        self.stats = stats
+        self.generation_interval = generation_interval
+        self.time_interval = time_interval
+        self.prefix = prefix
+        self.keep = keep
+        self.best_path = best_path
+
+        self.generation = generation
+        self.last_generation = generation
+        self.last_time = time.time()
+        self.best = best
+
+        self.error = None  # first exception of the writer thread, raised in the training thread
+        self.jobs = queue.Queue()
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def _write(self):
+        """
+        Background thread writing the queued (path, bytes, compress) jobs until it gets None. A job that fails is
+        kept for the training thread and the next jobs are still tried
+        :return: None
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            path, data, compress = job
+            try:
+                write_atomic(path, gzip.compress(data, compresslevel=5) if compress else data)
+                if compress:
+                    self._prune()
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+
+    def _raise_error(self):
+        """
+        raises the exception of a failed write, once
+        :return: None
+        """
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def _prune(self):
+        """
+        deletes all but the newest checkpoints
+        :return: None
+        """
+        paths = sorted(glob.glob(glob.escape(self.prefix) + '[0-9]*'), key=lambda p: int(p[len(self.prefix):]))
+        for path in paths[:-self.keep] if self.keep else []:
+            os.remove(path)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best_path and (self.best is None or best_genome.fitness > self.best.fitness):
+            self.best = best_genome
+            self.jobs.put((self.best_path, pickle.dumps(best_genome), False))
+
+    def end_generation(self, config, population, species_set):
+        self._raise_error()
+        generation = self.generation + 1
+        if self.generation_interval is not None and generation - self.last_generation >= self.generation_interval:
+            self.save(config, population, species_set, generation)
+        elif self.time_interval is not None and time.time() - self.last_time >= self.time_interval:
+            self.save(config, population, species_set, generation)
+
+    def save(self, config, population, species_set, generation):
+        """
+        Snapshots the run and hands it to the writer thread. The population passed to end_generation is already the
+        next one, so the checkpoint resumes at the next generation
+        :param config: neat configuration
+        :param population: dictionary of genomes
+        :param species_set: species set
+        :param generation: generation the population is about to be evaluated in
+        :return: None
+        """
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'generation': generation,
+            'config': config,
+            'population': population,
+            'species_set': species_set,
+            'best': self.best,
+            'stats': self.stats,
+            'random': random.getstate(),
+        }
+        # Pickled here, the genomes are changed by the next generation while the thread writes. The reporters of the
+        # species set, this one included, belong to the running process and are left out
+        reporters, species_set.reporters = species_set.reporters, None
+        try:
+            data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        finally:
+            species_set.reporters = reporters
+        self.jobs.put((self.prefix + str(generation), data, True))
+        self.last_generation = generation
+        self.last_time = time.time()
+
+    def close(self):
+        """
+        waits for the pending writes to finish and raises the exception of one that failed
+        :return: None
+        """
+        self.jobs.put(None)
+        self.writer.join()
+        self._raise_error()
+
+
+def latest(prefix='neat-checkpoint-'):
+    """
+    :param prefix: prefix of the checkpoint files
+    :return: path of the newest checkpoint, None if there is none
+    """
+    paths = glob.glob(glob.escape(prefix) + '[0-9]*')
+    return max(paths, key=lambda p: int(p[len(prefix):])) if paths else None
+
+
+def restore(path):
+    """
+    Rebuilds a population from a checkpoint, with the random state, best genome and statistics of the run
+    :param path: checkpoint file
+    :return: (neat.Population, StatisticsReporter or None)
+    """
+    with gzip.open(path) as f:
+        state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(path + ' is not a checkpoint this version can resume')
+
+    random.setstate(state['random'])
+    p = neat.Population(state['config'], (state['population'], state['species_set'], state['generation']))
+    p.species.reporters = p.reporters
+    p.best_genome = state['best']
+    # New genomes must not reuse the keys of the ones restored
+    p.reproduction.genome_indexer = itertools.count(max(state['population']) + 1)
+    return p, state['stats']
@@ -0,0 +1,298 @@
+"""
+Genome evaluation spread over several machines. A coordinator inside the training process listens on a TCP port,
+workers started on any host connect to it and are sent batches of genomes with the seed of the generation. A worker
+may take as long as it needs on a batch, the batch only goes back in the queue for another worker when its worker
+disconnects, so a worker dying only costs the batch it was on. TCP keepalive notices machines that went away without
+closing their connection. Messages are pickled and authenticated with a shared key by multiprocessing.connection.
+Anyone who knows the key can run code on the coordinator and the workers, so there is no default key: it is given with
+--authkey or the SPACEGAME_AUTHKEY environment variable, and a coordinator started without one makes up a random key
+and prints it. Only run it on a network you trust.
+
+    export SPACEGAME_AUTHKEY=...                     # the same secret on every machine
+    python Training.py --coordinator 0.0.0.0:6000    # on the training machine
+    python distributed.py trainer-host:6000          # on every worker machine, as many times as it has cores
+"""
+import argparse
+import math
+import os
+import queue
+import random
+import secrets
+import socket
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+from evaluation import add_stats, evaluate_genomes
+
+AUTHKEY_ENV = 'SPACEGAME_AUTHKEY'  # environment variable the key is read from when --authkey is not given
+HANDSHAKE_TIMEOUT = 10  # seconds a new connection has to prove it knows the key
+KEEPALIVE = (60, 10, 6)  # idle seconds before probing a quiet worker, seconds between probes, probes before giving up
+
+
+def parse_address(text):
+    """
+    :param text: host:port
+    :return: (host, port)
+    """
+    host, _, port = text.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+class _Deadline:
+    """
+    Connection whose reads give up at a deadline, for the key handshake of multiprocessing.connection which would
+    otherwise wait forever on a client that connects and sends nothing
+    """
+
+    def __init__(self, connection, seconds):
+        """
+        :param connection: multiprocessing Connection
+        :param seconds: time the whole handshake may take
+        """
+        self.connection = connection
+        self.deadline = time.monotonic() + seconds
+
+    def send_bytes(self, data):
+        self.connection.send_bytes(data)
+
+    def recv_bytes(self, maxlength=None):
+        if not self.connection.poll(max(0.0, self.deadline - time.monotonic())):
+            raise TimeoutError('no answer to the key handshake in time')
+        return self.connection.recv_bytes(maxlength)
+
+
+class DistributedEvaluator:
+    """
+    Coordinator handing out batches of genomes to the workers connected to it. One thread per worker sends it batches
+    and waits for the fitnesses, the training thread only waits for all batches of a generation to come back
+    """
+
+    def __init__(self, address=('localhost', 6000), authkey=None, batch_size=None, function=evaluate_genomes,
+                 seed=None, cache=None, stats=None):
+        """
+        :param address: (host, port) to listen on, only this machine can connect by default
+        :param authkey: key the workers must know, None for a random one that is printed
+        :param batch_size: genomes sent in one message, defaults to spreading a generation in four batches per worker
+        :param function: evaluate_genomes or evaluate_successive_halving, run by the workers on every batch
+        :param seed: seed of the episode of every generation, None for a new random one each generation
+        :param cache: FitnessCache of the genomes already evaluated, needs a seed
+        :param stats: dictionary the ship-frames simulated by the workers are added to
+        """
+        self.batch_size = batch_size
+        self.function = function
+        self.seed = seed
+        self.cache = cache
+        self.stats = stats
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.workers = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+        if not authkey:
+            authkey = secrets.token_urlsafe(16).encode()
+            print('Start the workers with --authkey ' + authkey.decode())
+        self.authkey = authkey
+        # The key is checked by the thread of every connection, a client that never answers only blocks its own
+        self.listener = Listener(address)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        """
+        Accepts workers until the evaluator is closed
+        :return: None
+        """
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                if self.closed:
+                    return
+                continue
+            if self.closed:
+                connection.close()
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _handshake(self, connection):
+        """
+        Checks that a new connection knows the key and proves to it that this end does too, like Listener does
+        :param connection: connection just accepted
+        :return: True if the connection is a worker, False if it was closed
+        """
+        try:
+            deadline = _Deadline(connection, HANDSHAKE_TIMEOUT)
+            deliver_challenge(deadline, self.authkey)
+            answer_challenge(deadline, self.authkey)
+            return True
+        except (OSError, EOFError, TimeoutError, AuthenticationError, AssertionError):
+            # e.g. a client with the wrong key, a port scanner or a connection that went quiet
+            connection.close()
+            return False
+
+    @staticmethod
+    def _keepalive(connection):
+        """
+        Has the system probe a worker that stays quiet, so one whose machine died or left the network is noticed as a
+        disconnection instead of being waited on forever. A worker that is only slow answers the probes and is kept
+        :param connection: connection to a worker
+        :return: None
+        """
+        idle, interval, count = KEEPALIVE
+        with socket.fromfd(connection.fileno(), socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Only some systems let the probes be tuned, the others probe after their own delays
+            for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    def _serve(self, connection):
+        """
+        Sends batches to one worker until it fails or the evaluator is closed
+        :param connection: connection to the worker
+        :return: None
+        """
+        if not self._handshake(connection) or self.closed:
+            connection.close()
+            return
+        self._keepalive(connection)
+        with self.lock:
+            self.workers += 1
+        config = None
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    return
+                generation, batch, genomes, job_config, seed = task
+                try:
+                    if job_config is not config:
+                        connection.send(('config', job_config))
+                        config = job_config
+                    connection.send(('evaluate', self.function, genomes, seed))
+                    result = connection.recv()
+                except (EOFError, OSError):
+                    # Another worker gets the batch, a worker that is only slow keeps its batch however long it takes
+                    self.tasks.put(task)
+                    return
+                self.results.put((generation, batch, result))
+        finally:
+            connection.close()
+            with self.lock:
+                self.workers -= 1
+
+    def evaluate(self, genomes, config):
+        """
+        Fitness function to give to neat.Population.run. All batches get the same seed, so the fitnesses are the ones
+        a single shared world would give
+        :param genomes: list of (genome id, genome)
+        :param config: neat configuration
+        :return: None
+        """
+        genomes = [g for _, g in genomes]
+        seed = random.randrange(2 ** 32) if self.seed is None else self.seed
+        if self.cache is not None:
+            fitnesses = self.cache.evaluate(self._map, genomes, config, seed)
+        else:
+            fitnesses = self._map(genomes, config, seed)
+        for g, fitness in zip(genomes, fitnesses):
+            g.fitness = fitness
+
+    def _map(self, genomes, config, seed):
+        """
+        Hands the genomes out in batches and waits for all of them to come back
+        :param genomes: list of genomes
+        :param config: neat configuration
+        :param seed: seed of the episode
+        :return: list with the fitness of every genome
+        """
+        generation = object()  # tells this generation's results from late ones of an earlier call
+        batch_size = self.batch_size or max(1, math.ceil(len(genomes) / (max(self.workers, 1) * 4)))
+
+        batches = [genomes[i:i + batch_size] for i in range(0, len(genomes), batch_size)]
+        for batch, chunk in enumerate(batches):
+            self.tasks.put((generation, batch, chunk, config, seed))
+
+        fitnesses = {}
+        waited = time.time()
+        while len(fitnesses) < len(batches):
+            try:
+                result_generation, batch, result = self.results.get(timeout=10)
+            except queue.Empty:
+                if not self.workers and time.time() - waited > 30:
+                    print('Waiting for workers on ' + str(self.address))
+                    waited = time.time()
+                continue
+            if result_generation is generation:
+                fitnesses[batch], stats = result
+                if self.stats is not None:
+                    add_stats(self.stats, stats)
+
+        return [fitness for batch in range(len(batches)) for fitness in fitnesses[batch]]
+
+    def close(self):
+        """
+        disconnects the workers and stops listening
+        :return: None
+        """
+        self.closed = True
+        for _ in range(self.workers):
+            self.tasks.put(None)
+        # The socket keeps listening while the accept thread waits on it, a connection wakes the thread up
+        host, port = self.address
+        try:
+            socket.create_connection(('localhost' if host in ('0.0.0.0', '::', '') else host, port), 1).close()
+        except OSError:
+            pass
+        self.listener.close()
+
+
+def run_worker(address, authkey, retry=5):
+    """
+    Connects to a coordinator and evaluates the batches it sends until it disconnects at the end of the training
+    :param address: (host, port) of the coordinator
+    :param authkey: key of the coordinator
+    :param retry: seconds between two connection attempts while the coordinator is not up yet, None to give up
+    :return: None
+    """
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if retry is None:
+                raise
+            time.sleep(retry)
+
+    config = None
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            if message[0] == 'config':
+                config = message[1]
+            else:
+                _, function, genomes, seed = message
+                stats = {}
+                fitnesses = function(genomes, config, seed, stats=stats)
+                try:
+                    connection.send((fitnesses, stats))
+                except OSError:
+                    return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluates genomes for a training run on another machine')
+    parser.add_argument('address', type=parse_address, help='host:port of the coordinator')
+    parser.add_argument('--authkey', default=os.environ.get(AUTHKEY_ENV),
+                        help='key shared with the coordinator, ' + AUTHKEY_ENV + ' by default')
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error('the key of the coordinator is needed, give --authkey or set ' + AUTHKEY_ENV)
+
+    run_worker(args.address, args.authkey.encode())
@@ -0,0 +1,279 @@
+"""
+Evaluation of NEAT genomes in headless simulation worlds. The functions here never touch pygame, so they can run in
+worker processes that have no display.
+"""
+import hashlib
+import math
+import multiprocessing
+import random
+from collections import OrderedDict
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+from batch_network import BatchNetwork, flatten_genome
+from population import PopulationWorld
+from profiler import NULL_PROFILER
+
+
+def evaluate_genomes(genomes, config, seed=None, profiler=NULL_PROFILER, spectator=None, stats=None):
+    """
+    Simulates a group of genomes in one headless population world, every genome drives its own spaceship
+    :param genomes: list of genomes
+    :param config: neat configuration
+    :param seed: seed of the asteroid stream
+    :param profiler: FrameProfiler timing every frame of the episode
+    :param spectator: SnapshotWriter the world is published to after every frame
+    :param stats: dictionary the simulated ship-frames are added to
+    :return: list with the fitness of every genome
+    """
+    net = BatchNetwork(genomes, config)
+    world = PopulationWorld(len(genomes), seed)
+    world.profiler = profiler
+    ship_frames = 0
+    while not world.done:
+        profiler.begin()
+        observations, _ = world.observe()
+        profiler.mark('observe')
+        actions = net.activate(observations)
+        profiler.mark('activate')
+        world.step(actions)
+        if spectator is not None:
+            spectator.publish(world)
+        if stats is not None:
+            ship_frames += np.count_nonzero(world.alive)
+        profiler.end()
+    if stats is not None:
+        stats['ship_frames'] = stats.get('ship_frames', 0) + int(ship_frames)
+    return world.fitness.tolist()
+
+
+HALVING_BUDGETS = (400, 800, 1600, 3200)  # frames after which the ships still alive are ranked and the worst stopped
+
+
+def evaluate_successive_halving(genomes, config, seed=None, budgets=HALVING_BUDGETS, keep=0.5,
+                                profiler=NULL_PROFILER, stats=None, spectator=None):
+    """
+    Like evaluate_genomes but the ships race through tiers: every time the frame of a budget is reached, only the
+    best fraction of the ships still alive carry on and the others keep the fitness they had. Ties are broken by the
+    bullets a ship wasted and then by the hash of its genome, so the cut does not depend on the order of the genomes.
+    The population world is shrunk to the promoted ships and their networks are rebuilt, so the frames after a tier
+    cost less. All ships face the same asteroids whatever tier they reach, and a promoted genome never ends below a
+    genome it beat when it was promoted, so fitnesses of different tiers can be compared directly.
+    :param genomes: list of genomes
+    :param config: neat configuration
+    :param seed: seed of the asteroid stream
+    :param budgets: increasing frames at which the ships are ranked, the last tier runs until the end. Most ships
+    of an evolved population die in the first few hundred frames, the budgets cut the few that live much longer
+    :param keep: fraction of the ships alive at a budget that are promoted
+    :param profiler: FrameProfiler timing every frame of the episode
+    :param stats: dictionary the simulated ship-frames and the ship-frames spared by stopping ships are added to
+    :param spectator: SnapshotWriter the world is published to after every frame
+    :return: list with the fitness of every genome
+    """
+    fitness = np.zeros(len(genomes))
+    floor = np.full(len(genomes), -np.inf)
+    rows = np.arange(len(genomes))  # genome of every ship of the world
+    net = BatchNetwork(genomes, config)
+    world = PopulationWorld(len(genomes), seed)
+    world.profiler = profiler
+    ship_frames = 0
+    stopped = []  # (number of ships stopped, frame they were stopped at)
+    hashes = None  # of the genomes, only computed if a tier is reached
+
+    for budget in list(budgets) + [None]:
+        while not world.done and (budget is None or world.frame < budget):
+            profiler.begin()
+            observations, _ = world.observe()
+            profiler.mark('observe')
+            actions = net.activate(observations)
+            profiler.mark('activate')
+            world.step(actions)
+            if spectator is not None:
+                spectator.publish(world)
+            profiler.end()
+            ship_frames += np.count_nonzero(world.alive)
+        fitness[rows] = world.fitness
+        if world.done:
+            break
+
+        alive = np.flatnonzero(world.alive)
+        if not len(alive):
+            break
+        if hashes is None:
+            hashes = [genome_hash(genome, config) for genome in genomes]
+        ranked = sorted(alive, key=lambda i: (-world.fitness[i], world.wasted[i], hashes[rows[i]]))
+        promoted = np.sort(ranked[:math.ceil(keep * len(alive))])
+        beaten = np.array(ranked[len(promoted):], dtype=np.int64)
+        if len(beaten):
+            floor[rows[promoted]] = np.maximum(floor[rows[promoted]], world.fitness[beaten].max())
+            stopped.append((len(beaten), world.frame))
+        world.keep(promoted)
+        rows = rows[promoted]
+        net = BatchNetwork([genomes[i] for i in rows], config)
+
+    if stats is not None:
+        stats['ship_frames'] = stats.get('ship_frames', 0) + int(ship_frames)
+        # At most, a stopped ship could not have outlived the episode
+        stats['spared_ship_frames'] = stats.get('spared_ship_frames', 0) + sum(
+            count * (world.frame - frame) for count, frame in stopped)
+    return np.maximum(fitness, floor).tolist()
+
+
+def genome_hash(genome, config):
+    """
+    :param genome: neat genome
+    :param config: neat configuration
+    :return: digest of the network the genome builds, its expressed nodes and links with their attributes. Genes that
+    do not reach an output, like disabled connections or dead end nodes, are left out, so mutating them keeps the hash
+    """
+    return hashlib.blake2b(repr(flatten_genome(genome, config)).encode(), digest_size=16).digest()
+
+
+class FitnessCache(BaseReporter):
+    """
+    Fitnesses of the genomes already evaluated, keyed by their network and the seed of the episode, so the elites
+    and the unchanged children carried into the next generation are not simulated again. Least recently used entries
+    are dropped once the cache is full. Only valid when the seed is the same every generation and a genome's fitness
+    depends on nothing but its network and the seed, as with evaluate_genomes: successive halving ranks genomes
+    against each other and cannot be cached. Added to the population as a reporter it prints its hits every generation
+    """
+
+    def __init__(self, max_size=1000):
+        """
+        :param max_size: number of fitnesses kept
+        """
+        self.max_size = max_size
+        self.fitnesses = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.generation_hits = 0
+        self.generation_misses = 0
+
+    def evaluate(self, function, genomes, config, seed):
+        """
+        :param function: function(genomes, config, seed) giving the fitnesses of the genomes that are not cached
+        :param genomes: list of genomes
+        :param config: neat configuration
+        :param seed: seed of the episode, it cannot be None
+        :return: list with the fitness of every genome
+        """
+        if seed is None:
+            raise ValueError('a fitness cache needs a fixed seed')
+        keys = [(genome_hash(g, config), seed) for g in genomes]
+        missing = {}  # key -> genome, genomes identical to one another are simulated once
+        for key, g in zip(keys, genomes):
+            if key in self.fitnesses:
+                self.fitnesses.move_to_end(key)
+            else:
+                missing.setdefault(key, g)
+        hits = len(genomes) - sum(1 for key in keys if key in missing)
+        self.hits += hits
+        self.misses += len(genomes) - hits
+        self.generation_hits += hits
+        self.generation_misses += len(genomes) - hits
+
+        fitnesses = {key: self.fitnesses[key] for key in keys if key not in missing}
+        if missing:
+            fitnesses.update(zip(missing, function(list(missing.values()), config, seed)))
+            for key in missing:
+                self.fitnesses[key] = fitnesses[key]
+            while len(self.fitnesses) > self.max_size:
+                self.fitnesses.popitem(last=False)
+        return [fitnesses[key] for key in keys]
+
+    def start_generation(self, generation):
+        self.generation_hits = 0
+        self.generation_misses = 0
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.generation_hits or self.generation_misses:
+            print('Fitness cache: {} hits, {} misses'.format(self.generation_hits, self.generation_misses))
+
+
+def add_stats(total, stats):
+    """
+    Adds the counts of one evaluation to a running total
+    :param total: dictionary of counts, e.g. ship_frames
+    :param stats: dictionary of counts to add
+    :return: None
+    """
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _evaluate_chunk(job):
+    """
+    Entry point of the worker processes
+    :param job: (evaluation function, genomes, config, seed)
+    :return: (list of fitnesses, dictionary of the counts of the evaluation)
+    """
+    function, genomes, config, seed = job
+    stats = {}
+    return function(genomes, config, seed, stats=stats), stats
+
+
+class ParallelEvaluator:
+    """
+    Spreads the genomes of a generation over a pool of worker processes. Each worker simulates a chunk of genomes in
+    its own world. Every chunk gets the same seed so all genomes of a generation face the same asteroids, which gives
+    exactly the fitnesses a single shared world would.
+    """
+
+    def __init__(self, num_workers=None, chunk_size=None, function=evaluate_genomes, seed=None, cache=None,
+                 stats=None):
+        """
+        :param num_workers: number of worker processes, defaults to the number of cores
+        :param chunk_size: genomes sent to a worker at once, defaults to spreading the population in four chunks per
+        worker so that slow chunks are balanced out
+        :param function: evaluate_genomes or evaluate_successive_halving, which then ranks the genomes of a chunk
+        :param seed: seed of the episode of every generation, None for a new random one each generation
+        :param cache: FitnessCache of the genomes already evaluated, needs a seed
+        :param stats: dictionary the ship-frames simulated by the workers are added to
+        """
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.function = function
+        self.seed = seed
+        self.cache = cache
+        self.stats = stats
+        self.pool = multiprocessing.Pool(self.num_workers)
+
+    def close(self):
+        """
+        stops the worker processes
+        :return: None
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, genomes, config):
+        """
+        Fitness function to give to neat.Population.run
+        :param genomes: list of (genome id, genome)
+        :param config: neat configuration
+        :return: None
+        """
+        genomes = [g for _, g in genomes]
+        seed = random.randrange(2 ** 32) if self.seed is None else self.seed
+        if self.cache is not None:
+            fitnesses = self.cache.evaluate(self._map, genomes, config, seed)
+        else:
+            fitnesses = self._map(genomes, config, seed)
+        for g, fitness in zip(genomes, fitnesses):
+            g.fitness = fitness
+
+    def _map(self, genomes, config, seed):
+        """
+        :param genomes: list of genomes
+        :param config: neat configuration
+        :param seed: seed of the episode
+        :return: list with the fitness of every genome
+        """
+        chunk_size = self.chunk_size or max(1, math.ceil(len(genomes) / (self.num_workers * 4)))
+        chunks = [genomes[i:i + chunk_size] for i in range(0, len(genomes), chunk_size)]
+        results = self.pool.map(_evaluate_chunk, [(self.function, chunk, config, seed) for chunk in chunks])
+        if self.stats is not None:
+            for _, stats in results:
+                add_stats(self.stats, stats)
+        return [fitness for fitnesses, _ in results for fitness in fitnesses]
@@ -0,0 +1,150 @@
+"""
+Leaderboard storage. Every finished game is appended to a score log under a file lock, the best scores are kept in a
+small heap in memory and a snapshot of the board is written now and then with an atomic rename. A crash can at worst
+lose the scores appended since the last snapshot was read, never the board, and several game instances can share the
+same files.
+"""
+import heapq
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def locked(path):
+    """
+    Opens a file for appending and holds an exclusive lock on it
+    :param path: file to lock
+    :return: the open file
+    """
+    with open(path, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Leaderboard:
+    """
+    The top scores of the game. The snapshot file keeps the format of the old leaderBoard.txt (scores separated by
+    spaces, best first) with a second line telling how much of the log it already contains
+    """
+
+    def __init__(self, path='leaderBoard.txt', log_path=None, size=10, compact_every=20):
+        """
+        :param path: snapshot of the board
+        :param log_path: append-only log of every submitted score, next to the snapshot by default
+        :param size: number of scores on the board
+        :param compact_every: scores submitted by this instance between two snapshots
+        """
+        self.path = path
+        self.log_path = log_path or os.path.splitext(path)[0] + '.log'
+        self.size = size
+        self.compact_every = compact_every
+        self.heap = []  # min-heap of the best scores, heap[0] is the lowest score on the board
+        self.offset = 0  # bytes of the log already in the heap
+        self.pending = 0
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                lines = f.read().splitlines()
+            if lines:
+                for score in lines[0].split():
+                    self._push(int(score))
+            if len(lines) > 1 and lines[1].startswith('log '):
+                self.offset = int(lines[1].split()[1])
+        self._catch_up()
+
+    def _push(self, score):
+        """
+        puts a score in the heap if it makes the board, O(log K)
+        :param score: score
+        :return: None
+        """
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, score)
+        elif score > self.heap[0]:
+            heapq.heapreplace(self.heap, score)
+
+    def _catch_up(self):
+        """
+        reads the scores other instances appended to the log since we last looked. Only the new end of the log is
+        read and a line that is still being written is left for later
+        :return: None
+        """
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].split():
+            self._push(int(line))
+        self.offset += end
+
+    def submit(self, score):
+        """
+        Adds the score of a finished game
+        :param score: score
+        :return: position of the score on the board, None if it did not make it
+        """
+        line = (str(score) + '\n').encode()
+        with locked(self.log_path) as log:
+            self._catch_up()
+            log.write(line)
+            log.flush()
+            os.fsync(log.fileno())
+            self.offset += len(line)
+
+            position = self.rank(score)
+            self._push(score)
+            self.pending += 1
+            if self.pending >= self.compact_every:
+                self.compact()
+        return position
+
+    def compact(self):
+        """
+        Writes the board to the snapshot file. The new file is written next to the old one and renamed over it, so
+        readers see either the old board or the new one
+        :return: None
+        """
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(' '.join(str(score) for score in self.top()) + '\n')
+            f.write('log ' + str(self.offset) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.pending = 0
+
+    def top(self, k=None):
+        """
+        :param k: number of scores, the whole board by default
+        :return: best scores, best first
+        """
+        self._catch_up()
+        return sorted(self.heap, reverse=True)[:k]
+
+    def rank(self, score):
+        """
+        :param score: score
+        :return: position the score would take on the board starting at 1, None if it would not make it
+        """
+        if len(self.heap) == self.size and score <= self.heap[0]:
+            return None
+        return 1 + sum(1 for s in self.heap if s > score)
@@ -0,0 +1,160 @@
+"""
+Small binary format for trained networks so the game can load the aimbot without neat or pickle. A genome is flattened
+once with the same node order as neat.nn.FeedForwardNetwork and its node evals are stored as plain numbers, the loader
+only needs struct and math. Given the same inputs a loaded network returns exactly what the neat network does.
+
+    python network.py neuralNetwork neuralNetwork.net
+"""
+import argparse
+import math
+import os
+import struct
+
+MAGIC = b'SGNN'
+VERSION = 1
+HEADER = struct.Struct('<4sBHHH')  # magic, version, number of inputs, outputs and node evals
+KEY = struct.Struct('<i')
+NODE = struct.Struct('<iBddH')  # node, activation, bias, response, number of links
+LINK = struct.Struct('<id')  # input node, weight
+
+# Same functions as neat.activations, the position in the list is the id stored in the file
+ACTIVATIONS = [
+    ('sigmoid', lambda z: 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, 5.0 * z))))),
+    ('tanh', lambda z: math.tanh(max(-60.0, min(60.0, 2.5 * z)))),
+    ('sin', lambda z: math.sin(max(-60.0, min(60.0, 5.0 * z)))),
+    ('gauss', lambda z: math.exp(-5.0 * max(-3.4, min(3.4, z)) ** 2)),
+    ('relu', lambda z: z if z > 0.0 else 0.0),
+    ('identity', lambda z: z),
+    ('clamped', lambda z: max(-1.0, min(1.0, z))),
+    ('abs', abs),
+    ('square', lambda z: z ** 2),
+    ('cube', lambda z: z ** 3),
+]
+ACTIVATION_IDS = {name: index for index, (name, _) in enumerate(ACTIVATIONS)}
+
+
+class CompiledNetwork:
+    """
+    Feed forward network read from a file written by export(). The node evals are turned into the source of one
+    Python function with a local variable per node and the weights as constants, so activating it does no dictionary
+    or list lookups at all. Products are summed in the same order as neat does, which keeps the outputs identical
+    """
+
+    def __init__(self, input_keys, output_keys, node_evals):
+        """
+        :param input_keys: keys of the input nodes
+        :param output_keys: keys of the output nodes
+        :param node_evals: list of (node, activation name, bias, response, [(input node, weight)]) in evaluation order
+        """
+        index = {key: i for i, key in enumerate(input_keys)}
+        for node, _, _, _, _ in node_evals:
+            index.setdefault(node, len(index))
+        for key in output_keys:
+            index.setdefault(key, len(index))
+
+        namespace = {name: function for name, function in ACTIVATIONS}
+        source = ['def activate(inputs):']
+        source.append('    ' + ''.join('v{}, '.format(i) for i in range(len(input_keys))) + '= inputs')
+        # Outputs that no node eval reaches stay at 0 like in neat
+        source += ['    v{} = 0.0'.format(index[key]) for key in output_keys]
+        for node, activation, bias, response, links in node_evals:
+            total = ' + '.join('v{} * {}'.format(index[i], self._constant(w, namespace)) for i, w in links)
+            bias, response = self._constant(bias, namespace), self._constant(response, namespace)
+            source.append('    v{} = {}({} + {} * ({}))'.format(index[node], activation, bias, response,
+                                                             total or '0.0'))
+        source.append('    return [' + ', '.join('v{}'.format(index[key]) for key in output_keys) + ']')
+
+        self.num_inputs = len(input_keys)
+        self.source = '\n'.join(source)
+        exec(self.source, namespace)
+        self.activate = namespace['activate']
+
+    @staticmethod
+    def _constant(value, namespace):
+        """
+        :param value: float
+        :param namespace: globals of the generated function, values without a literal are put there
+        :return: text of the value in the generated source
+        """
+        if math.isfinite(value):
+            return repr(value)
+        name = 'c' + str(len(namespace))
+        namespace[name] = value
+        return name
+
+
+def export(genome, config, path):
+    """
+    Writes the network of a genome to a file the game can load without neat
+    :param genome: neat genome
+    :param config: neat configuration
+    :param path: file to write
+    :return: None
+    """
+    from batch_network import flatten_genome
+
+    input_keys = config.genome_config.input_keys
+    output_keys = config.genome_config.output_keys
+    node_evals = [node for layer in flatten_genome(genome, config) for node in layer]
+
+    chunks = [HEADER.pack(MAGIC, VERSION, len(input_keys), len(output_keys), len(node_evals))]
+    chunks += [KEY.pack(key) for key in list(input_keys) + list(output_keys)]
+    for node, activation, aggregation, bias, response, links in node_evals:
+        if aggregation != 'sum':
+            raise ValueError('only sum aggregation can be exported, not ' + aggregation)
+        if activation not in ACTIVATION_IDS:
+            raise ValueError('the activation ' + activation + ' cannot be exported')
+        chunks.append(NODE.pack(node, ACTIVATION_IDS[activation], bias, response, len(links)))
+        chunks += [LINK.pack(i, w) for i, w in links]
+
+    with open(path, 'wb') as f:
+        f.write(b''.join(chunks))
+
+
+def load(path):
+    """
+    :param path: file written by export()
+    :return: CompiledNetwork
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, num_inputs, num_outputs, num_nodes = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(path + ' is not a network file')
+    if version != VERSION:
+        raise ValueError(path + ' has version ' + str(version) + ', expected ' + str(VERSION))
+    offset = HEADER.size
+
+    keys = [key for key, in KEY.iter_unpack(data[offset:offset + KEY.size * (num_inputs + num_outputs)])]
+    offset += KEY.size * (num_inputs + num_outputs)
+
+    node_evals = []
+    for _ in range(num_nodes):
+        node, activation, bias, response, num_links = NODE.unpack_from(data, offset)
+        offset += NODE.size
+        links = list(LINK.iter_unpack(data[offset:offset + LINK.size * num_links]))
+        offset += LINK.size * num_links
+        node_evals.append((node, ACTIVATIONS[activation][0], bias, response, links))
+
+    return CompiledNetwork(keys[:num_inputs], keys[num_inputs:], node_evals)
+
+
+if __name__ == '__main__':
+    import pickle
+
+    import neat
+
+    parser = argparse.ArgumentParser(description='Exports a pickled genome to a network file the game loads')
+    parser.add_argument('genome', help='pickled genome, e.g. neuralNetwork')
+    parser.add_argument('output', help='network file to write, e.g. neuralNetwork.net')
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'config-feedforward.txt'), help='neat configuration')
+    args = parser.parse_args()
+
+    with open(args.genome, 'rb') as f:
+        genome = pickle.load(f)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                args.config)
+    export(genome, config, args.output)
@@ -0,0 +1,147 @@
+"""
+Network inputs of the ships, built for every ship of a world in one pass of array operations. A world copies its
+asteroids into an AsteroidTable indexed by ring slot, and an Observer turns the table, the asteroids each ship has not
+dealt with yet and the ship positions into one row of inputs per ship. PopulationWorld and the worlds of a VectorEnv
+both go through it, so they see exactly the same inputs. The single ship of GameWorld reads its five inputs straight
+from the oldest asteroid and only goes through an Observer when it is given one.
+
+The first five columns are the inputs the networks are trained on: (asteroid x, asteroid y, asteroid angle, ship x,
+ship y) of the oldest asteroid the ship has not dealt with. An Observer can append more columns after them:
+    nearest         the offset from the ship and the angle of the k nearest asteroids it has not dealt with, nearest
+                    first, zeros where there are fewer than k
+    time_to_impact  frames until the bottom of the target asteroid reaches the top of the ship, 0 once it has
+A network using them needs num_inputs set to Observer.size in its configuration.
+"""
+import math
+
+import numpy as np
+
+BASE_INPUTS = 5
+FAR = np.iinfo(np.int64).max
+
+
+class AsteroidTable:
+    """
+    Features of the asteroids on screen by slot, either of one world, shared by all its ships, or with one row per
+    world. Only the centres of the asteroids change from frame to frame, their angle, size and speed are read when
+    they land in a slot and kept until another asteroid takes it. The table of one world lists its slots in spawn
+    order, a table with a row per world gives the spawn order of every slot instead
+    """
+
+    def __init__(self, capacity, num_worlds=None):
+        """
+        :param capacity: number of asteroid slots
+        :param num_worlds: None for the table of one world, else the number of rows
+        """
+        shape = (capacity,) if num_worlds is None else (num_worlds, capacity)
+        self.x = np.zeros(shape)  # centre in whole pixels, like Asteroid.center
+        self.y = np.zeros(shape)
+        self.angle = np.zeros(shape)
+        self.half = np.zeros(shape)  # half of the side, in whole pixels
+        self.velocity = np.ones(shape)  # vertical velocity
+        self.order = np.zeros(shape, dtype=np.int64)  # lower is older, tables with a row per world only
+        self.valid = np.zeros(shape, dtype=bool)
+        self.slots = np.zeros(0, dtype=np.int64) if num_worlds is None else None
+        self.asteroids = [None] * capacity
+        self.frame = None
+
+    def update(self, asteroids, frame=None):
+        """
+        Reads the asteroids of a world, once per frame
+        :param asteroids: AsteroidLifecycle of the world
+        :param frame: frame of the world, the table is left as it is if it was already updated in this frame
+        :return: None
+        """
+        if frame is not None and frame == self.frame:
+            return
+        self.frame = frame
+        slots = []
+        centers = []
+        for asteroid in asteroids:
+            slot = asteroid.slot
+            if self.asteroids[slot] is not asteroid:
+                self.asteroids[slot] = asteroid
+                self.angle[slot] = asteroid.angle
+                self.half[slot] = asteroid.length // 2
+                self.velocity[slot] = asteroid.VELOCITY * math.cos(asteroid.angle)
+            slots.append(slot)
+            centers.append(asteroid.center)
+        self.slots = np.array(slots, dtype=np.int64)
+        self.valid[:] = False
+        self.valid[self.slots] = True
+        if centers:
+            self.x[self.slots], self.y[self.slots] = zip(*centers)
+
+
+class Observer:
+    """
+    Builds the inputs of all the ships of a world from its AsteroidTable
+    """
+
+    def __init__(self, nearest=0, time_to_impact=False):
+        """
+        :param nearest: number of nearest asteroids whose (dx, dy, angle) are added, 0 for none
+        :param time_to_impact: adds the frames until the target asteroid reaches the ship
+        """
+        self.nearest = nearest
+        self.time_to_impact = time_to_impact
+
+    @property
+    def size(self):
+        """
+        :return: number of inputs per ship
+        """
+        return BASE_INPUTS + int(self.time_to_impact) + 3 * self.nearest
+
+    def __call__(self, table, available, ship_x, ship_y, alive):
+        """
+        :param table: AsteroidTable of the world, or with one row per ship
+        :param available: (N, capacity) bool array of the asteroids each ship has neither shot nor missed
+        :param ship_x: (N,) array of ship x
+        :param ship_y: ship y, the same for every ship, or a (N,) array
+        :param alive: (N,) bool array of the ships still in the episode, or True
+        :return: (N, size) float array of inputs and a (N,) bool array of the ships that are alive and have an
+        asteroid to look at. The asteroid columns of the other ships are 0
+        """
+        n = len(ship_x)
+        active = alive & available.any(axis=1)
+        if table.slots is not None:
+            # One world: the first available column of the slots in spawn order
+            target = table.slots[available[:, table.slots].argmax(axis=1)] if len(table.slots) else np.zeros(n, int)
+
+            def at_target(values):
+                return values[target]
+        else:
+            rows = np.arange(n)
+            target = np.where(available, table.order, FAR).argmin(axis=1)
+
+            def at_target(values):
+                return values[rows, target]
+
+        observations = np.zeros((n, self.size))
+        observations[:, 0] = at_target(table.x)
+        observations[:, 1] = at_target(table.y)
+        observations[:, 2] = at_target(table.angle)
+        observations[~active, :3] = 0
+        observations[:, 3] = ship_x
+        observations[:, 4] = ship_y
+        column = BASE_INPUTS
+
+        if self.time_to_impact:
+            distance = ship_y - observations[:, 1] - at_target(table.half)
+            np.divide(np.maximum(distance, 0), at_target(table.velocity), out=observations[:, column], where=active)
+            column += 1
+
+        if self.nearest:
+            dx = table.x - np.asarray(ship_x, dtype=float)[:, None]
+            dy = table.y - np.asarray(ship_y, dtype=float).reshape(-1, 1)
+            distance = np.where(available, dx * dx + dy * dy, np.inf)
+            k = min(self.nearest, available.shape[1])
+            nearest = np.argsort(distance, axis=1, kind='stable')[:, :k]
+            found = np.take_along_axis(available, nearest, axis=1)
+            block = np.zeros((n, self.nearest, 3))
+            for feature, values in enumerate((dx, dy, np.broadcast_to(table.angle, available.shape))):
+                block[:, :k, feature] = np.where(found, np.take_along_axis(values, nearest, axis=1), 0)
+            observations[:, column:] = block.reshape(n, -1)
+
+        return observations, active
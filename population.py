@@ -0,0 +1,130 @@
+"""
+Struct-of-arrays version of SimulationWorld. Every per-ship quantity (position, cooldown, bullets, fitness, which
+asteroids are still available) is a NumPy array, so one frame costs the same handful of array operations whether the
+population has a hundred ships or ten thousand. Only the asteroids, of which there are a few on screen at once, are
+looped over in Python. Given the same seed and actions it produces exactly the same fitnesses as SimulationWorld.
+The rules of the ships and bullets are the ones of ship_arrays, shared with the worlds of a VectorEnv.
+"""
+import random
+
+import numpy as np
+
+from observations import AsteroidTable, Observer
+from profiler import NULL_PROFILER
+from ship_arrays import ShipArrays
+from simulation import Asteroid, AsteroidLifecycle, MAX_ASTEROIDS, SPAWN_INTERVAL
+
+
+class PopulationWorld(ShipArrays):
+    """
+    One training episode for a whole population of spaceships facing the same stream of asteroids
+    """
+
+    def __init__(self, num_ships, seed=None, observer=None):
+        """
+        :param num_ships: number of spaceships, one per genome
+        :param seed: seed of the asteroid stream, None for a random one
+        :param observer: Observer building the network inputs, the five inputs of Training by default
+        """
+        self.num_ships = num_ships
+        self.observer = observer or Observer()
+        self.profiler = NULL_PROFILER  # gets the phases of step() when profiling
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts a new episode
+        :param seed: seed of the asteroid stream, None for a random one
+        :return: observations of the first frame
+        """
+        n = self.num_ships
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.allocate_ships(n)
+
+        # One column per slot of the asteroid ring, True while the ship has neither shot nor missed that asteroid
+        self.asteroids = AsteroidLifecycle()
+        self.available = np.zeros((n, self.asteroids.capacity), dtype=bool)
+        self.table = AsteroidTable(self.asteroids.capacity)
+        self.num_asteroids = 0
+        self.count = 0
+        self.frame = 0
+        return self.observe()
+
+    @property
+    def done(self):
+        """
+        :return: True when every ship is dead or all the asteroids of the episode have been spawned
+        """
+        return self.num_asteroids > MAX_ASTEROIDS or not self.alive.any()
+
+    def keep(self, rows):
+        """
+        Drops every ship but the given ones from the episode, e.g. the ships that were not promoted to a longer
+        episode. Row i of the arrays is then the ship that was in row rows[i]
+        :param rows: sorted indices of the ships to keep
+        :return: None
+        """
+        self.num_ships = len(rows)
+        for name in ('ship_x', 'tick', 'score', 'fitness', 'wasted', 'alive', 'bullet_x', 'bullet_y', 'bullet_valid',
+                     'available'):
+            setattr(self, name, getattr(self, name)[rows])
+
+    def observe(self):
+        """
+        Builds the network inputs of every ship from the first asteroid it has not dealt with yet
+        :return: (N, observer.size) float array starting with the (asteroid x, asteroid y, asteroid angle, ship x,
+        ship y) columns and a (N,) bool array telling which ships are alive and have an asteroid to look at
+        """
+        self.table.update(self.asteroids, self.frame)
+        return self.observer(self.table, self.available, self.ship_x, self.ship_y, self.alive)
+
+    def step(self, actions):
+        """
+        Advances the world by one frame
+        :param actions: (N, 2) array with the two network outputs of every ship, rows of inactive ships are ignored. A
+        positive first output moves right, a negative one moves left and a second output <= 0 shoots
+        :return: None
+        """
+        self.frame += 1
+        self.count += 1
+        self.act(np.asarray(actions))
+
+        # Asteroids that went past the ships are removed, ships that did not shoot them die
+        for asteroid in self.asteroids.expire(self.frame):
+            self.miss(self.available[:, asteroid.slot].copy())
+            self.available[:, asteroid.slot] = False
+
+        if self.count >= SPAWN_INTERVAL:
+            asteroid = self.asteroids.spawn(Asteroid(self.rng), self.frame)
+            self.available[:, asteroid.slot] = self.alive
+            self.num_asteroids += 1
+            self.count = 0
+        self.profiler.mark('rules')
+
+        for asteroid in self.asteroids:
+            asteroid.move()
+        self.advance()
+        self.profiler.mark('move')
+
+        self.collide()
+        self.profiler.mark('collide')
+
+    def collide(self):
+        """
+        checks every asteroid against all bullets and ships at once then it increases or decreases the fitness, removes
+        the bullets that have hit and kills the ships that have been hit
+        :return: None
+        """
+        self.collide_asteroids(self._asteroids())
+
+    def _asteroids(self):
+        """
+        :return: generator of the asteroids on screen that some ships still have available, in spawn order, as
+        collide_asteroids takes them
+        """
+        for asteroid in self.asteroids:
+            candidates = self.available[:, asteroid.slot]
+            if candidates.any():
+                x, y, length, _ = asteroid.get_mask()
+                yield candidates, asteroid.slot, x, y, length
@@ -0,0 +1,155 @@
+"""
+Per-phase frame profiler. A frame is split into phases by calling mark() after each of them, the time since the
+previous mark goes to the named phase. The profiler keeps a rolling window of samples per phase for the p50/p99 shown
+in the HUD and can stream every sample to a CSV file. When profiling is off the loops get NULL_PROFILER, whose methods
+do nothing, so the instrumentation costs a few empty calls per frame.
+"""
+import time
+from collections import deque
+
+
+class FrameProfiler:
+    """
+    Times the phases of a main loop frame by frame
+    """
+    enabled = True
+
+    def __init__(self, window=300, csv_path=None, refresh=30):
+        """
+        :param window: number of frames the percentiles are computed over
+        :param csv_path: file every (frame, phase, milliseconds) sample is written to, None to keep them in memory only
+        :param refresh: frames between two updates of the HUD lines
+        """
+        self.window = window
+        self.refresh = refresh
+        self.samples = {}
+        self.totals = deque(maxlen=window)
+        self.current = {}
+        self.frame = 0
+        self.last = time.perf_counter()
+        self.show_hud = True
+        self.lines = []
+
+        self.file = self.writer = None
+        if csv_path:
+            import csv  # only needed when writing samples, keeps importing the simulation light
+
+            self.file = open(csv_path, 'w', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(('frame', 'phase', 'milliseconds'))
+
+    def begin(self):
+        """
+        starts a frame
+        :return: None
+        """
+        self.current = {}
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        adds the time since the last mark to a phase, a phase marked more than once in a frame adds up
+        :param phase: name of the phase that just finished
+        :return: None
+        """
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end(self):
+        """
+        ends a frame and stores its samples, phases that did not run in this frame count as 0
+        :return: None
+        """
+        self.frame += 1
+        total = 0.0
+        for phase in self.current:
+            if phase not in self.samples:
+                self.samples[phase] = deque(maxlen=self.window)
+        for phase, samples in self.samples.items():
+            seconds = self.current.get(phase, 0.0)
+            samples.append(seconds)
+            total += seconds
+            if self.writer and phase in self.current:
+                self.writer.writerow((self.frame, phase, round(seconds * 1000, 4)))
+        if self.writer:
+            self.writer.writerow((self.frame, 'frame', round(total * 1000, 4)))
+        self.totals.append(total)
+
+    def percentiles(self):
+        """
+        :return: dictionary of phase: (p50, p99) in milliseconds over the last frames
+        """
+        result = {}
+        for phase, samples in list(self.samples.items()) + [('frame', self.totals)]:
+            ordered = sorted(samples)
+            if ordered:
+                p99 = ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)]
+                result[phase] = (ordered[len(ordered) // 2] * 1000, p99 * 1000)
+        return result
+
+    def report(self):
+        """
+        :return: the percentiles as text, one phase per line
+        """
+        return '\n'.join('{:<10} p50 {:7.3f} ms  p99 {:7.3f} ms'.format(phase, p50, p99)
+                         for phase, (p50, p99) in self.percentiles().items())
+
+    def hud_lines(self):
+        """
+        :return: lines of text to draw over the game, they only change every few frames so the HUD stays cheap to draw
+        """
+        if not self.show_hud:
+            return []
+        if self.frame % self.refresh == 0 or not self.lines:
+            self.lines = ['{} {:.2f}/{:.2f}'.format(phase, p50, p99)
+                          for phase, (p50, p99) in self.percentiles().items()]
+        return self.lines
+
+    def toggle_hud(self):
+        """
+        shows or hides the HUD
+        :return: None
+        """
+        self.show_hud = not self.show_hud
+
+    def close(self):
+        """
+        flushes and closes the CSV file
+        :return: None
+        """
+        if self.file:
+            self.file.close()
+            self.file = self.writer = None
+
+
+class NullProfiler:
+    """
+    Stand-in used when profiling is off, every method does nothing
+    """
+    enabled = False
+    show_hud = False
+
+    def begin(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end(self):
+        pass
+
+    def report(self):
+        return ''
+
+    def hud_lines(self):
+        return []
+
+    def toggle_hud(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,97 @@
+"""
+Dirty rectangle rendering for the game. Only the parts of the window that changed since the last frame are redrawn
+and sent to the display, instead of blitting the whole background and updating the full screen every frame.
+"""
+import pygame
+
+
+class CachedText:
+    """
+    A line of text that is only rendered again when it changes
+    """
+
+    def __init__(self, font, color):
+        """
+        :param font: pygame font
+        :param color: color of the text
+        """
+        self.font = font
+        self.color = color
+        self.text = None
+        self.surface = None
+
+    def get(self, text):
+        """
+        :param text: text to show
+        :return: rendered surface of the text
+        """
+        if text != self.text:
+            self.text = text
+            self.surface = self.font.render(text, True, self.color)
+        return self.surface
+
+
+class DirtyRenderer:
+    """
+    Keeps the rectangles drawn in the last frame. At the start of a frame those are covered with the background again,
+    and at the end only the old and new rectangles are updated on the display
+    """
+
+    def __init__(self, window, background):
+        """
+        :param window: display surface
+        :param background: surface the size of the window drawn behind everything
+        """
+        self.window = window
+        self.background = background
+        self.previous = []
+        self.current = []
+        self.full = True
+
+    def invalidate(self):
+        """
+        redraws the whole window on the next frame, e.g. after another screen has been drawn over the game
+        :return: None
+        """
+        self.full = True
+
+    def begin(self):
+        """
+        erases what was drawn in the last frame
+        :return: None
+        """
+        if self.full:
+            self.window.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.window.blit(self.background, rect, rect)
+
+    def blit(self, surface, position):
+        """
+        draws a surface and marks its area as dirty
+        :param surface: surface to draw
+        :param position: top left corner
+        :return: None
+        """
+        self.current.append(self.window.blit(surface, position))
+
+    def rect(self, color, rect):
+        """
+        draws a filled rectangle and marks it as dirty
+        :param color: color of the rectangle
+        :param rect: (x, y, width, height)
+        :return: None
+        """
+        self.current.append(pygame.draw.rect(self.window, color, rect))
+
+    def end(self):
+        """
+        sends the dirty areas to the display
+        :return: None
+        """
+        if self.full:
+            pygame.display.update()
+            self.full = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous, self.current = self.current, []
@@ -0,0 +1,128 @@
+"""
+Recording and replaying games. A recording is the seed of the game plus one byte of input per tick, which is all
+GameWorld needs to play a game again exactly the same way. Replays run headless and as fast as the CPU allows, and the
+final score and state hash are checked against the ones saved with the recording.
+
+A recording is laid out as:
+    header  b'SGRP', version (B), seed (Q)
+    inputs  zlib compressed, one byte per tick with the LEFT, RIGHT, SHOOT and TOGGLE_AIMBOT bits
+    footer  ticks (I), score (i), lives (b), state hash (16s)
+"""
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+import network
+from simulation import BULLET_AGE, GameWorld
+
+MAGIC = b'SGRP'
+VERSION = 1
+HEADER = struct.Struct('<4sBQ')
+FOOTER = struct.Struct('<Iib16s')
+
+LEFT, RIGHT, SHOOT, TOGGLE_AIMBOT = 1, 2, 4, 8
+
+
+def state_hash(world):
+    """
+    :param world: GameWorld
+    :return: 16 byte digest of everything that matters in the state of the game
+    """
+    ship = world.ship
+    # Bullets are hashed oldest first as [x, y], their order in the list of the ship is not part of the state
+    bullets = [bullet[:2] for bullet in sorted(ship.bullets, key=BULLET_AGE)]
+    state = (world.frame, world.count, world.lives, ship.score, ship.x, ship.tick, ship.aimBot, bullets,
+             [(asteroid.id, asteroid.x, asteroid.y) for asteroid in world.asteroids])
+    return hashlib.blake2b(repr(state).encode(), digest_size=16).digest()
+
+
+class Recorder:
+    """
+    Records the inputs of a game as it is played
+    """
+
+    def __init__(self, seed):
+        """
+        :param seed: seed the GameWorld was made with
+        """
+        self.seed = seed
+        self.inputs = bytearray()
+
+    def record(self, left=False, right=False, shoot=False, toggle_aimbot=False):
+        """
+        Adds the inputs of one tick, takes the same arguments as GameWorld.step
+        :return: None
+        """
+        self.inputs.append(LEFT * bool(left) | RIGHT * bool(right) | SHOOT * bool(shoot) |
+                           TOGGLE_AIMBOT * bool(toggle_aimbot))
+
+    def save(self, path, world):
+        """
+        Writes the recording with the final state of the game to check replays against
+        :param path: file to write
+        :param world: GameWorld at the end of the game
+        :return: None
+        """
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed))
+            f.write(zlib.compress(bytes(self.inputs), 9))
+            f.write(FOOTER.pack(len(self.inputs), world.ship.score, world.lives, state_hash(world)))
+
+
+def load(path):
+    """
+    :param path: recording
+    :return: dictionary with the seed, the inputs and the expected ticks, score, lives and hash
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + ' is not a version ' + str(VERSION) + ' recording')
+    ticks, score, lives, digest = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+    inputs = zlib.decompress(data[HEADER.size:len(data) - FOOTER.size])
+    return {'seed': seed, 'inputs': inputs, 'ticks': ticks, 'score': score, 'lives': lives, 'hash': digest}
+
+
+def replay(path, pilot=None):
+    """
+    Plays a recording again without a window
+    :param path: recording
+    :param pilot: aimbot network, needed when the aimbot was turned on during the game
+    :return: (GameWorld at the end, True if the final state matches the recording)
+    """
+    recording = load(path)
+    world = GameWorld(recording['seed'], pilot)
+    for byte in recording['inputs']:
+        world.step(byte & LEFT, byte & RIGHT, byte & SHOOT, byte & TOGGLE_AIMBOT)
+
+    matches = (world.frame == recording['ticks'] and world.ship.score == recording['score'] and
+               world.lives == recording['lives'] and state_hash(world) == recording['hash'])
+    return world, matches
+
+
+def load_pilot(local_dir):
+    """
+    Loads the aimbot network the same way Game.py does
+    :param local_dir: directory with neuralNetwork.net
+    :return: activate function of the network
+    """
+    return network.load(os.path.join(local_dir, 'neuralNetwork.net')).activate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays recorded games headless and checks their final state')
+    parser.add_argument('recordings', nargs='+', help='recordings made with Game.py --record')
+    args = parser.parse_args()
+
+    pilot = load_pilot(os.path.dirname(os.path.abspath(__file__)))
+    failed = 0
+    for path in args.recordings:
+        world, matches = replay(path, pilot)
+        print(path + ': ' + ('ok' if matches else 'MISMATCH') + ', ' + str(world.frame) + ' ticks, score ' +
+              str(world.ship.score))
+        failed += not matches
+    sys.exit(1 if failed else 0)
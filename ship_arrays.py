@@ -0,0 +1,136 @@
+"""
+Rules of the spaceships and their bullets on NumPy arrays, one row per ship. PopulationWorld, where every ship faces
+the same asteroids, and WorldBatch, where every ship has a world of its own, both keep their ships in these arrays and
+step them with these rules, so they only differ in how they keep their asteroids. SimulationWorld is the reference both
+are checked against.
+"""
+import numpy as np
+
+from simulation import Spaceship, SHIP_START, SPACESHIP_HEIGHT, SPACESHIP_WIDTH, WIN_WIDTH
+
+BULLET_SLOTS = Spaceship.MAX_BULLETS + 1  # shoot() allows one more bullet while there are MAX_BULLETS on screen
+FAR = np.iinfo(np.int64).max
+
+
+class ShipArrays:
+    """
+    Ships of a world as arrays. Subclasses also have an available (N, asteroid slots) bool array, True while a ship has
+    neither shot nor missed the asteroid of a slot
+    """
+
+    ship_y = SHIP_START[1]  # the ships only move sideways
+
+    def allocate_ships(self, n):
+        """
+        Makes the arrays of n ships at the start position
+        :param n: number of ships
+        :return: None
+        """
+        self.ship_x = np.full(n, SHIP_START[0], dtype=np.int64)
+        self.tick = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.fitness = np.zeros(n)
+        self.wasted = np.zeros(n, dtype=np.int64)  # bullets that left the screen without hitting anything
+        self.alive = np.ones(n, dtype=bool)
+
+        self.bullet_x = np.zeros((n, BULLET_SLOTS), dtype=np.int64)
+        self.bullet_y = np.zeros((n, BULLET_SLOTS), dtype=np.int64)
+        self.bullet_valid = np.zeros((n, BULLET_SLOTS), dtype=bool)
+
+    def kill(self, mask):
+        """
+        removes ships from the episode, their fitness is kept
+        :param mask: (N,) bool array of the ships to kill
+        :return: None
+        """
+        self.alive &= ~mask
+        self.bullet_valid[mask] = False
+        self.available[mask] = False
+
+    def act(self, actions):
+        """
+        Starts a frame: ships whose fitness fell too low die, then the others move and shoot
+        :param actions: (N, 2) array with the two network outputs of every ship, rows of inactive ships are ignored. A
+        positive first output moves right, a negative one moves left and a second output <= 0 shoots
+        :return: None
+        """
+        starved = self.alive & (self.fitness <= -100)
+        self.fitness[starved] -= 10
+        self.kill(starved)
+
+        active = self.alive & self.available.any(axis=1)
+        velocity = Spaceship.SPACESHIP_VELOCITY
+        right = active & (actions[:, 0] > 0) & (self.ship_x + velocity + SPACESHIP_WIDTH < WIN_WIDTH)
+        left = active & (actions[:, 0] < 0) & (self.ship_x - velocity > 0)
+        self.ship_x += velocity * right - velocity * left
+
+        free = ~self.bullet_valid
+        shoot = active & (actions[:, 1] <= 0) & (self.tick >= Spaceship.SHOOT_DELAY) & free.any(axis=1)
+        rows = np.flatnonzero(shoot)
+        slots = free[rows].argmax(axis=1)
+        self.bullet_x[rows, slots] = self.ship_x[rows] + SPACESHIP_WIDTH // 2
+        self.bullet_y[rows, slots] = self.ship_y - Spaceship.BULLET_HEIGHT
+        self.bullet_valid[rows, slots] = True
+        self.tick[rows] = 0
+
+    def miss(self, mask):
+        """
+        kills the ships that let an asteroid go past them
+        :param mask: (N,) bool array of the ships that did not shoot an asteroid that went past
+        :return: None
+        """
+        self.fitness[mask] -= 2
+        self.kill(mask)
+
+    def advance(self):
+        """
+        moves the bullets up and counts the frames since every ship last shot
+        :return: None
+        """
+        self.tick[self.alive] += 1
+        self.bullet_y -= Spaceship.BULLET_VELOCITY * self.bullet_valid
+
+    def collide_asteroids(self, asteroids):
+        """
+        checks asteroids against the bullets and ships, in the order they are given so a bullet touching two asteroids
+        hits the first one, then it increases or decreases the fitness, removes the bullets that have hit or left the
+        screen and kills the ships that have been hit
+        :param asteroids: iterable of (candidates, column, x, y, length), one asteroid per ship: the (N,) bool array of
+        the ships that still have it available, its column in available as an int or a (N,) array, and its box as
+        numbers shared by every ship or (N, 1) arrays. It is read lazily, the availability changes as asteroids are hit
+        :return: None
+        """
+        ship_x = self.ship_x[:, None]
+        ship_right = ship_x + SPACESHIP_WIDTH
+        ship_bottom = self.ship_y + SPACESHIP_HEIGHT
+        bullet_right = self.bullet_x + Spaceship.BULLET_WIDTH
+        bullet_bottom = self.bullet_y + Spaceship.BULLET_HEIGHT
+
+        for candidates, column, x, y, length in asteroids:
+            right = x + length
+            bottom = y + length
+            hits = (self.bullet_valid & candidates[:, None] & (self.bullet_x < right) & (x < bullet_right) &
+                    (self.bullet_y < bottom) & (y < bullet_bottom))
+            shot = hits.any(axis=1)
+            if shot.any():
+                # The oldest bullet, the highest one on screen, is the one that hits
+                rows = np.flatnonzero(shot)
+                slots = np.where(hits[rows], self.bullet_y[rows], FAR).argmin(axis=1)
+                self.bullet_valid[rows, slots] = False
+                self.score[rows] += 1
+                self.fitness[rows] += 5
+                self.available[rows, column[rows] if np.ndim(column) else column] = False
+
+            crashed = candidates & ~shot & ((ship_x < right) & (x < ship_right) &
+                                            (self.ship_y < bottom) & (y < ship_bottom))[:, 0]
+            if crashed.any():
+                self.score[crashed] -= 5
+                self.fitness[crashed] -= 4
+                self.kill(crashed)
+
+        # Bullets that left the screen are removed
+        gone = self.bullet_valid & (self.bullet_y < -Spaceship.BULLET_HEIGHT)
+        wasted = gone.sum(axis=1)
+        self.wasted += wasted
+        self.fitness -= 0.1 * wasted
+        self.bullet_valid &= ~gone
@@ -0,0 +1,719 @@
+"""
+Headless simulation of the training world. It holds the spaceship, asteroid, bullet and collision logic used by
+Training.py without a single display call, so genomes can be evaluated as fast as the CPU allows. Drawing is left to an
+optional observer that reads the world state after every step.
+"""
+import heapq
+import math
+import operator
+import random
+
+from broadphase import SpatialHash
+from profiler import NULL_PROFILER
+
+WIN_WIDTH, WIN_HEIGHT = 400, 600
+
+SPACESHIP_HEIGHT = 50
+SPACESHIP_WIDTH = 69
+SHIP_START = (200, 450)
+
+SPAWN_INTERVAL = 80  # frames between two asteroids
+MAX_ASTEROIDS = 1500  # an episode ends once this many asteroids have been spawned
+SPAWN_ORDER = operator.attrgetter('id')
+BULLET_AGE = operator.itemgetter(1)  # bullets all fly up at the same speed, so the oldest is the highest
+
+GAME_SHIP_START = (100, 450)
+GAME_LIVES = 3
+SIM_RATE = 60  # ticks per second when a game starts
+SIM_RATE_RAMP = 0.01  # the game speeds up by this many ticks per second every tick
+
+
+def collide(a, b):
+    """
+    Same test as pygame.Rect.colliderect for two (x, y, width, height) tuples
+    :param a: first rectangle
+    :param b: second rectangle
+    :return: True if the rectangles overlap
+    """
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def frames_until_below(y, velocity, limit):
+    """
+    Works out how many frames something moving down goes on for before it is removed. It repeats the same additions
+    as the move methods do, so the frame is exact: the object is removed the frame after it is first found below the
+    limit
+    :param y: starting height
+    :param velocity: distance moved down per frame
+    :param limit: height it has to go below
+    :return: number of frames between the spawn and the removal
+    """
+    frames = 1
+    while y <= limit:
+        y += velocity
+        frames += 1
+    return frames
+
+
+class Spaceship:
+    SPACESHIP_VELOCITY = 5
+
+    BULLET_VELOCITY = 5
+    BULLET_HEIGHT, BULLET_WIDTH = 10, 5
+    MAX_BULLETS = 3
+    SHOOT_DELAY = 50
+
+    __slots__ = ('x', 'y', 'width', 'height', 'rect', 'bullets', 'spare', 'tick', 'score', 'alive', 'available')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.width = SPACESHIP_WIDTH
+        self.height = SPACESHIP_HEIGHT
+        self.rect = [x, y, self.width, self.height]
+        # Bullets are [x, y, width, height] lists, their own rectangle. They are taken from a pool of as many as can be
+        # on screen and given back when they are removed, in no particular order
+        self.bullets = []
+        self.spare = [[0, 0, self.BULLET_WIDTH, self.BULLET_HEIGHT] for _ in range(self.MAX_BULLETS + 1)]
+        self.tick = 0
+        self.score = 0
+        self.alive = True
+        self.available = 0  # bit per asteroid slot, set while the ship has neither shot nor missed that asteroid
+
+    def move_right(self):
+        """
+        moves the spaceship right as long as its right side does not go out of the screen
+        :return: None
+        """
+        if self.x + self.SPACESHIP_VELOCITY + self.width < WIN_WIDTH:
+            self.x += self.SPACESHIP_VELOCITY
+
+    def move_left(self):
+        """
+        Same thing as move right but checks that the spaceship does not go too far left outside
+        :return: None
+        """
+        if self.x - self.SPACESHIP_VELOCITY > 0:
+            self.x -= self.SPACESHIP_VELOCITY
+
+    def shoot(self):
+        """
+        allows us to shoot a bullet only once every SHOOT_DELAY frames and a maximum number of bullets.
+        A bullet starts in the middle of the spaceship, just above it
+        :return: None
+        """
+        if self.tick >= self.SHOOT_DELAY:
+            if len(self.bullets) <= self.MAX_BULLETS:
+                bullet = self.spare.pop()
+                bullet[0] = self.x + self.width // 2
+                bullet[1] = self.y - self.BULLET_HEIGHT
+                self.bullets.append(bullet)
+                self.tick = 0
+
+    def remove_bullet(self, index):
+        """
+        gives a bullet back to the pool, the last bullet takes its place
+        :param index: index of the bullet in self.bullets
+        :return: None
+        """
+        bullets = self.bullets
+        bullet = bullets[index]
+        bullets[index] = bullets[-1]
+        bullets.pop()
+        self.spare.append(bullet)
+
+    def clear_bullets(self):
+        """
+        gives every bullet back to the pool
+        :return: None
+        """
+        self.spare.extend(self.bullets)
+        self.bullets.clear()
+
+    def update(self):
+        """
+        advances the shooting cooldown and moves every bullet up
+        :return: None
+        """
+        self.tick += 1
+        for bullet in self.bullets:
+            bullet[1] -= self.BULLET_VELOCITY
+
+    def get_mask(self):
+        """
+        :return: Rectangle of the spaceship to use for collisions, the same list every time
+        """
+        self.rect[0] = self.x
+        return self.rect
+
+    def bullet_mask(self, bullet):
+        """
+        :param bullet: bullet of the spaceship
+        :return: Rectangle of the bullet to use for collisions
+        """
+        return bullet
+
+    def __repr__(self):
+        return "Ship at " + str(self.x)
+
+
+class Asteroid:
+    VELOCITY = 5
+
+    __slots__ = ('length', 'x', 'y', 'target_x', 'angle', 'rect', 'id', 'slot')
+
+    def __init__(self, rng=random):
+        """
+        sets up the asteroid. We take it to be a square with a random length and random starting position. We displace
+        it above by its length, so it starts from the top.
+        :param rng: random number generator, the random module or a seeded random.Random
+        """
+        self.length = rng.randrange(50, 100, 5)
+        self.x = rng.randint(SPACESHIP_WIDTH // 2, WIN_WIDTH - SPACESHIP_WIDTH // 2)
+        self.y = -self.length
+        self.target_x = rng.randint(0, WIN_WIDTH)  # Random coordinate to go to
+        self.angle = math.atan((self.target_x - self.x) / (WIN_HEIGHT + self.length))  # gets an angle to aim
+        self.rect = [0, 0, self.length, self.length]
+        self.sync_rect()
+
+    def move(self):
+        """
+        moves the asteroid such that the angle is maintained
+        :return: None
+        """
+        self.x += self.VELOCITY * math.sin(self.angle)
+        self.y += self.VELOCITY * math.cos(self.angle)
+        self.sync_rect()
+
+    def sync_rect(self):
+        """
+        updates the rectangle in place after the position changed
+        :return: None
+        """
+        rect = self.rect
+        rect[0] = int(self.x)
+        rect[1] = int(self.y)
+
+    def lifetime(self):
+        """
+        :return: number of frames between the spawn of the asteroid and its removal once it has passed the ships
+        """
+        return frames_until_below(self.y, self.VELOCITY * math.cos(self.angle), 450 + self.length)
+
+    def get_mask(self):
+        """
+        :return: Rectangle of the asteroid to use for collisions, truncated to whole pixels like a pygame.Rect. It is
+        kept up to date by move(), not copied
+        """
+        return self.rect
+
+    @property
+    def center(self):
+        """
+        :return: centre of the asteroid rectangle in whole pixels
+        """
+        return int(self.x) + self.length // 2, int(self.y) + self.length // 2
+
+    def __repr__(self):
+        return 'Asteroid ' + str(self.x)
+
+
+class AsteroidLifecycle:
+    """
+    The asteroids on screen. Every asteroid gets a stable id and a slot in a fixed size ring of slots, and its removal
+    frame is scheduled in a heap when it spawns, so expiring asteroids is a batch pop per frame instead of an event per
+    asteroid and a list shift. Iterating gives the asteroids in spawn order.
+    """
+
+    def __init__(self, capacity=16):
+        """
+        :param capacity: number of asteroids that can be on screen at once
+        """
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.next_id = 0
+        self.live = {}  # id -> asteroid, in spawn order
+        self.schedule = []  # heap of (removal frame, id)
+
+    def spawn(self, asteroid, frame):
+        """
+        adds an asteroid and schedules its removal
+        :param asteroid: asteroid with a lifetime() method
+        :param frame: current frame
+        :return: the asteroid, with its id and slot set
+        """
+        if len(self.live) == self.capacity:
+            raise RuntimeError('More than ' + str(self.capacity) + ' asteroids on screen')
+        asteroid.id = self.next_id
+        asteroid.slot = self.next_id % self.capacity
+        while self.slots[asteroid.slot] is not None:
+            asteroid.slot = (asteroid.slot + 1) % self.capacity
+        self.next_id += 1
+
+        self.slots[asteroid.slot] = asteroid
+        self.live[asteroid.id] = asteroid
+        heapq.heappush(self.schedule, (frame + asteroid.lifetime(), asteroid.id))
+        return asteroid
+
+    def remove(self, asteroid):
+        """
+        removes an asteroid before its time, e.g. when it has been shot. Its schedule entry is skipped later on
+        :param asteroid: asteroid to remove
+        :return: None
+        """
+        del self.live[asteroid.id]
+        self.slots[asteroid.slot] = None
+
+    def expire(self, frame):
+        """
+        removes every asteroid whose removal frame has come
+        :param frame: current frame
+        :return: list of the removed asteroids
+        """
+        expired = []
+        while self.schedule and self.schedule[0][0] <= frame:
+            _, asteroid_id = heapq.heappop(self.schedule)
+            asteroid = self.live.get(asteroid_id)
+            if asteroid is not None:
+                self.remove(asteroid)
+                expired.append(asteroid)
+        return expired
+
+    def first(self):
+        """
+        :return: the oldest asteroid on screen, None if there are none
+        """
+        return next(iter(self.live.values()), None)
+
+    def __iter__(self):
+        return iter(self.live.values())
+
+    def __len__(self):
+        return len(self.live)
+
+
+class SimulationWorld:
+    """
+    One training episode: a population of spaceships that all face the same stream of asteroids. Ships never interact
+    with each other, each one only loses the asteroids it has shot or missed, so every ship's fate depends on its own
+    actions and the seed alone.
+    """
+
+    def __init__(self, num_ships, seed=None):
+        """
+        :param num_ships: number of spaceships, one per genome
+        :param seed: seed of the asteroid stream, None for a random one
+        """
+        self.num_ships = num_ships
+        self.grid = SpatialHash()
+        self.profiler = NULL_PROFILER  # gets the phases of step() when profiling
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts a new episode
+        :param seed: seed of the asteroid stream, None for a random one
+        :return: observations of the first frame
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.ships = [Spaceship(*SHIP_START) for _ in range(self.num_ships)]
+        self.fitness = [0.0] * self.num_ships
+        self.asteroids = AsteroidLifecycle()
+        self.num_asteroids = 0
+        self.count = 0
+        self.frame = 0
+        return self.observe()
+
+    @property
+    def alive(self):
+        """
+        :return: number of ships still alive
+        """
+        return sum(1 for ship in self.ships if ship.alive)
+
+    @property
+    def done(self):
+        """
+        :return: True when every ship is dead or all the asteroids of the episode have been spawned
+        """
+        return self.num_asteroids > MAX_ASTEROIDS or not any(ship.alive for ship in self.ships)
+
+    def observe(self):
+        """
+        Builds the network inputs of every ship from the first asteroid it has not dealt with yet
+        :return: list with a (asteroid x, asteroid y, asteroid angle, ship x, ship y) tuple per ship, None for ships
+        that are dead or have no asteroid to look at
+        """
+        # The features of each asteroid are worked out once, ships only look up the first one whose bit they have
+        targets = [(1 << asteroid.slot, asteroid.center + (asteroid.angle,)) for asteroid in self.asteroids]
+        observations = []
+        for ship in self.ships:
+            observation = None
+            if ship.available:
+                for bit, features in targets:
+                    if ship.available & bit:
+                        observation = features + (ship.x, ship.y)
+                        break
+            observations.append(observation)
+        return observations
+
+    def kill(self, index):
+        """
+        removes a ship from the episode, its fitness is kept
+        :param index: index of the ship
+        :return: None
+        """
+        ship = self.ships[index]
+        ship.alive = False
+        ship.clear_bullets()
+        ship.available = 0
+
+    def step(self, actions):
+        """
+        Advances the world by one frame
+        :param actions: list with the two network outputs of every ship or None when a ship does nothing. A positive
+        first output moves right, a negative one moves left and a second output <= 0 shoots
+        :return: None
+        """
+        self.frame += 1
+        self.count += 1
+
+        for x, ship in enumerate(self.ships):
+            if not ship.alive:
+                continue
+            if self.fitness[x] <= -100:
+                self.fitness[x] -= 10
+                self.kill(x)
+                continue
+            output = actions[x]
+            if output is not None and ship.available:
+                if output[0] > 0:
+                    ship.move_right()
+                elif output[0] < 0:
+                    ship.move_left()
+                if output[1] <= 0:
+                    ship.shoot()
+
+        # Asteroids that went past the ships are removed, ships that did not shoot them die
+        for asteroid in self.asteroids.expire(self.frame):
+            bit = 1 << asteroid.slot
+            for x, ship in enumerate(self.ships):
+                if ship.available & bit:
+                    self.fitness[x] -= 2
+                    self.kill(x)
+
+        if self.count >= SPAWN_INTERVAL:
+            asteroid = self.asteroids.spawn(Asteroid(self.rng), self.frame)
+            self.num_asteroids += 1
+            bit = 1 << asteroid.slot
+            for ship in self.ships:
+                if ship.alive:
+                    ship.available |= bit
+            self.count = 0
+        self.profiler.mark('rules')
+
+        for asteroid in self.asteroids:
+            asteroid.move()
+        for ship in self.ships:
+            if ship.alive:
+                ship.update()
+        self.profiler.mark('move')
+
+        self.collide()
+        self.profiler.mark('collide')
+
+    def collide(self):
+        """
+        checks for collisions between bullets and asteroids as well as asteroids and spaceships then it increases or
+        decreases the fitness, removes the bullets that have hit and kills the ships that have been hit
+        :return: None
+        """
+        self.grid.clear()
+        for asteroid in self.asteroids:
+            self.grid.insert(asteroid, asteroid.get_mask())
+
+        for x, ship in enumerate(self.ships):
+            if not ship.alive:
+                continue
+            ship_mask = ship.get_mask()
+            bullets = ship.bullets
+            candidates = self.grid.query(ship_mask)
+            for bullet in bullets:
+                self.grid.query(bullet, candidates)
+
+            # Asteroids are handled in spawn order so a bullet touching two asteroids hits the older one
+            for asteroid in sorted(candidates, key=SPAWN_ORDER):
+                bit = 1 << asteroid.slot
+                if not ship.available & bit:
+                    continue
+                asteroid_mask = asteroid.get_mask()
+                # Of the bullets touching the asteroid the oldest one hits it
+                hit = -1
+                for i, bullet in enumerate(bullets):
+                    if collide(bullet, asteroid_mask) and (hit < 0 or bullet[1] < bullets[hit][1]):
+                        hit = i
+                if hit >= 0:
+                    ship.score += 1
+                    self.fitness[x] += 5
+                    ship.available &= ~bit
+                    ship.remove_bullet(hit)
+                elif collide(ship_mask, asteroid_mask):
+                    ship.score -= 5
+                    self.fitness[x] -= 4
+                    self.kill(x)
+
+        # Bullets that left the screen are removed
+        for x, ship in enumerate(self.ships):
+            if ship.alive and ship.bullets:
+                gone = 0
+                for i in range(len(ship.bullets) - 1, -1, -1):
+                    if ship.bullets[i][1] < -ship.BULLET_HEIGHT:
+                        ship.remove_bullet(i)
+                        gone += 1
+                if gone:
+                    self.fitness[x] -= 0.1 * gone
+
+
+class GameAsteroid(Asteroid):
+    """
+    Asteroid of the interactive game. It spawns anywhere along the top, aims for where the ship can be and is only
+    removed once it has left the screen. The previous position is kept so the renderer can interpolate between ticks
+    """
+
+    __slots__ = ('prev_x', 'prev_y')
+
+    def __init__(self, rng=random):
+        """
+        :param rng: random number generator, the random module or a seeded random.Random
+        """
+        self.length = rng.randrange(50, 100, 5)
+        self.x = rng.randint(0, WIN_WIDTH - self.length)
+        self.y = -self.length
+        self.target_x = rng.randint(SPACESHIP_WIDTH // 2, WIN_WIDTH - SPACESHIP_WIDTH // 2)  # Random x to go to
+        self.angle = math.atan((self.target_x - self.x) / (450 + self.length))  # gets an angle to aim
+        self.prev_x, self.prev_y = self.x, self.y
+        self.rect = [0, 0, self.length, self.length]
+        self.sync_rect()
+
+    def move(self):
+        """
+        moves the asteroid such that the angle is maintained and remembers where it was
+        :return: None
+        """
+        self.prev_x, self.prev_y = self.x, self.y
+        super().move()
+
+    def lifetime(self):
+        """
+        :return: number of frames between the spawn of the asteroid and its removal once it has gone below the screen
+        """
+        return frames_until_below(self.y, self.VELOCITY * math.cos(self.angle), WIN_HEIGHT)
+
+
+class GameShip(Spaceship):
+    """
+    Spaceship of the interactive game, it can go all the way to the left edge and can be driven by the aimbot
+    """
+
+    __slots__ = ('prev_x', 'aimBot')
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.prev_x = x
+        self.aimBot = False
+
+    def move_left(self):
+        """
+        Same thing as move right but checks that the spaceship does not go too far left outside
+        :return: None
+        """
+        if self.x - self.SPACESHIP_VELOCITY + 1 > 0:
+            self.x -= self.SPACESHIP_VELOCITY
+
+    def update(self):
+        """
+        advances the shooting cooldown, removes the bullets that have gone above the screen and moves the others up
+        :return: None
+        """
+        self.tick += 1
+        for i in range(len(self.bullets) - 1, -1, -1):
+            if self.bullets[i][1] < -self.BULLET_HEIGHT:
+                self.remove_bullet(i)
+        for bullet in self.bullets:
+            bullet[1] -= self.BULLET_VELOCITY
+
+
+class GameWorld:
+    """
+    The rules of the interactive game without any drawing: one ship, three lives, a life back every 100 points and a
+    game that speeds up over time. It advances in fixed ticks, so a game plays the same on any machine and can be run
+    faster than real time
+    """
+
+    def __init__(self, seed=None, pilot=None, observer=None):
+        """
+        :param seed: seed of the asteroid stream, None for a random one
+        :param pilot: function giving the two network outputs for an observation, drives the ship when the aimbot is on
+        :param observer: Observer building the inputs of the pilot, None for the five inputs of Training, which are
+        read straight from the oldest asteroid
+        """
+        self.pilot = pilot
+        self.observer = observer
+        self.grid = SpatialHash()
+        self.profiler = NULL_PROFILER  # gets the phases of step() when profiling
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts a new game
+        :param seed: seed of the asteroid stream, None for a random one
+        :return: None
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.ship = GameShip(*GAME_SHIP_START)
+        self.asteroids = AsteroidLifecycle()
+        self.table = None
+        if self.observer is not None:
+            # Only imported here, the game does not need NumPy otherwise
+            from observations import AsteroidTable
+            self.table = AsteroidTable(self.asteroids.capacity)
+        self.lives = GAME_LIVES
+        self.count = 0
+        self.frame = 0
+
+    @property
+    def tick_rate(self):
+        """
+        :return: ticks per second the game should run at, it goes up over time to make the game harder
+        """
+        return SIM_RATE + SIM_RATE_RAMP * self.frame
+
+    @property
+    def done(self):
+        """
+        :return: True when the ship has no lives left
+        """
+        return self.lives <= 0
+
+    def observe(self):
+        """
+        :return: aimbot inputs, starting with (asteroid x, asteroid y, asteroid angle, ship x, ship y) for the oldest
+        asteroid, None if there are no asteroids
+        """
+        if self.observer is None:
+            asteroid = self.asteroids.first()
+            if asteroid is None:
+                return None
+            return asteroid.center + (asteroid.angle, self.ship.x, self.ship.y)
+        if not self.asteroids:
+            return None
+        # Asteroids are shot during a tick, so the table is read again on every call
+        self.table.update(self.asteroids)
+        observations, _ = self.observer(self.table, self.table.valid[None], [self.ship.x], self.ship.y, True)
+        return tuple(observations[0].tolist())
+
+    def step(self, left=False, right=False, shoot=False, toggle_aimbot=False):
+        """
+        Advances the game by one tick
+        :param left: left key held
+        :param right: right key held
+        :param shoot: space held
+        :param toggle_aimbot: turns the aimbot on or off
+        :return: None
+        """
+        ship = self.ship
+        ship.prev_x = ship.x
+        self.frame += 1
+        self.count += 1
+
+        # Asteroids that went below the screen are removed on the frame they were scheduled for
+        self.asteroids.expire(self.frame)
+
+        if shoot:
+            ship.shoot()
+        if not ship.aimBot:
+            if left:
+                ship.move_left()
+            if right:
+                ship.move_right()
+        if toggle_aimbot:
+            ship.aimBot = not ship.aimBot
+
+        # Spawns a new asteroid every 80 ticks and adds a life for every 100 points
+        if self.count == SPAWN_INTERVAL:
+            self.asteroids.spawn(GameAsteroid(self.rng), self.frame)
+            self.count = 0
+            if ship.score % 100 == 0 and ship.score != 0 and self.lives < GAME_LIVES:
+                self.lives += 1
+                self.count = 20
+        self.profiler.mark('rules')
+
+        for asteroid in self.asteroids:
+            asteroid.move()
+        self.profiler.mark('move')
+        if ship.aimBot and self.pilot is not None:
+            self.aim_bot()
+            self.profiler.mark('pilot')
+        ship.update()
+        self.profiler.mark('move')
+        self.collide()
+        self.profiler.mark('collide')
+
+    def aim_bot(self):
+        """
+        Asks the pilot where the spaceship should be to hit the oldest asteroid and moves there
+        :return: None
+        """
+        observation = self.observe()
+        if observation is not None:
+            output = self.pilot(observation)
+            if output[0] > 0:
+                self.ship.move_right()
+            elif output[0] < 0:
+                self.ship.move_left()
+            if output[1] <= 0:
+                self.ship.shoot()
+
+    def collide(self):
+        """
+        checks for collisions between bullets and asteroids as well as asteroids and the spaceship then it increases
+        the score or takes a life and removes the bullets and asteroids that have collided
+        :return: None
+        """
+        ship = self.ship
+        self.grid.clear()
+        for asteroid in self.asteroids:
+            self.grid.insert(asteroid, asteroid.get_mask())
+
+        # We delete the bullets and asteroids at the end so that problems don't arise due to them being deleted while
+        # looping through them
+        rembullets = []
+        remasteroids = []
+
+        # Checks for bullets that have hit an asteroid and deletes them and increments the score. The oldest bullets
+        # go first, so of two bullets touching the same asteroid the older one hits it
+        bullets = ship.bullets
+        for i in sorted(range(len(bullets)), key=lambda i: bullets[i][1]):
+            bullet_mask = bullets[i]
+            for asteroid in sorted(self.grid.query(bullet_mask), key=SPAWN_ORDER):
+                if asteroid not in remasteroids and collide(bullet_mask, asteroid.get_mask()):
+                    ship.score += 1
+                    remasteroids.append(asteroid)
+                    rembullets.append(i)
+                    break
+
+        # If an asteroid hits the ship one life is removed
+        ship_mask = ship.get_mask()
+        for asteroid in self.grid.query(ship_mask):
+            if collide(ship_mask, asteroid.get_mask()):
+                self.lives -= 1
+                if asteroid not in remasteroids:
+                    remasteroids.append(asteroid)
+
+        for asteroid in remasteroids:
+            self.asteroids.remove(asteroid)
+        # Swapping the last bullet in only moves bullets that come after the ones still to be removed
+        for i in sorted(rembullets, reverse=True):
+            ship.remove_bullet(i)
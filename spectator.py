@@ -0,0 +1,335 @@
+"""
+Live view of a training run from another process. The evaluating process copies a compact snapshot of its population
+world (ship positions, bullets, asteroid boxes and fitnesses) into a ring of slots in shared memory, at most a few
+dozen times a second and only while a viewer is attached, and never waits for anything. A viewer maps the same memory,
+draws the newest snapshot at its own frame rate and can be started or closed at any time:
+
+    python Training.py --spectate            # the training, it does not open a window
+    python spectator.py --top 20             # in another terminal, as often as you like
+
+Every slot starts with a sequence number that is odd while the slot is being written, a viewer copies a slot and keeps
+the copy only if the number was even and did not change in the meantime.
+"""
+import argparse
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+from neat.reporting import BaseReporter
+
+from simulation import Spaceship, SHIP_START, SPACESHIP_HEIGHT, SPACESHIP_WIDTH, WIN_HEIGHT, WIN_WIDTH
+
+NAME = 'spacegame-spectator'
+MAGIC = b'SGSP'
+VERSION = 1
+BULLET_SLOTS = Spaceship.MAX_BULLETS + 1
+DETACHED_AFTER = 2.0  # seconds without a heartbeat of the viewer after which nothing is published
+ENDED_AFTER = 10.0  # seconds without a heartbeat of the writer after which a viewer takes the run as over
+
+# The heartbeats are time.time() of the last frame drawn by a viewer and of the last frame the writer looked at
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('slots', '<u4'), ('max_ships', '<u4'),
+                   ('max_asteroids', '<u4'), ('heartbeat', '<f8'), ('writer_heartbeat', '<f8'), ('published', '<u8')])
+
+
+def _untrack(memory):
+    """
+    Keeps the resource tracker of this process from removing a shared memory it only attached to when it exits, only
+    the writer that made the memory may remove it
+    :param memory: SharedMemory attached to by name
+    :return: None
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    except (ImportError, AttributeError):
+        pass
+
+
+def _writer_alive(memory):
+    """
+    :param memory: SharedMemory of a writer
+    :return: True if the memory belongs to a writer of this version heard of less than ENDED_AFTER seconds ago
+    """
+    if memory.size < HEADER.itemsize:
+        return False
+    header = np.ndarray((), HEADER, memory.buf)
+    try:
+        return (bytes(header['magic']) == MAGIC and int(header['version']) == VERSION and
+                time.time() - float(header['writer_heartbeat']) <= ENDED_AFTER)
+    finally:
+        del header  # the memory cannot be closed while an array uses it
+
+
+def snapshot_dtype(max_ships, max_asteroids):
+    """
+    :param max_ships: ships a snapshot has room for
+    :param max_asteroids: asteroids a snapshot has room for
+    :return: NumPy dtype of one slot of the ring
+    """
+    return np.dtype([
+        ('sequence', '<u8'), ('generation', '<i4'), ('frame', '<i4'), ('num_ships', '<i4'), ('population', '<i4'),
+        ('alive', '<i4'), ('num_asteroids', '<i4'),
+        ('ship', '<i4', (max_ships,)),  # index of the ship in the world
+        ('ship_x', '<i2', (max_ships,)),
+        ('ship_alive', '?', (max_ships,)),
+        ('fitness', '<f4', (max_ships,)),
+        ('bullet_x', '<i2', (max_ships, BULLET_SLOTS)),
+        ('bullet_y', '<i2', (max_ships, BULLET_SLOTS)),
+        ('bullet_valid', '?', (max_ships, BULLET_SLOTS)),
+        ('asteroids', '<f4', (max_asteroids, 4)),  # x, y, length, angle
+    ])
+
+
+class SnapshotWriter(BaseReporter):
+    """
+    Publishes snapshots of a PopulationWorld for spectator viewers. Added to the population as a reporter it also
+    knows the generation being evaluated
+    """
+
+    def __init__(self, name=NAME, slots=4, max_ships=1000, max_asteroids=16, rate=30):
+        """
+        :param name: name of the shared memory, viewers attach to it by name
+        :param slots: snapshots in the ring
+        :param max_ships: ships a snapshot has room for, the best ones alive are sent when the world has more
+        :param max_asteroids: asteroids a snapshot has room for
+        :param rate: snapshots per second at most
+        :raise FileExistsError: when another training that is still running publishes under that name
+        """
+        self.dtype = snapshot_dtype(max_ships, max_asteroids)
+        self.max_ships = max_ships
+        self.max_asteroids = max_asteroids
+        self.interval = 1.0 / rate
+        self.next_publish = 0.0
+        self.generation = 0
+
+        size = HEADER.itemsize + slots * self.dtype.itemsize
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Either another run is publishing, or it is left behind by a run that was killed before closing it
+            existing = shared_memory.SharedMemory(name)
+            if _writer_alive(existing):
+                _untrack(existing)
+                existing.close()
+                raise FileExistsError('a training run that is still going publishes under ' + name +
+                                      ', only one run at a time can be watched') from None
+            existing.close()
+            existing.unlink()
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        self.header = np.ndarray((), HEADER, self.memory.buf)
+        self.ring = np.ndarray((slots,), self.dtype, self.memory.buf, HEADER.itemsize)
+        self.ring['sequence'] = 0
+        self.header['heartbeat'] = 0
+        self.header['writer_heartbeat'] = time.time()
+        self.header['published'] = 0
+        self.header['slots'], self.header['max_ships'], self.header['max_asteroids'] = slots, max_ships, max_asteroids
+        self.header['version'] = VERSION
+        self.header['magic'] = MAGIC
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def publish(self, world):
+        """
+        Copies the state of a world into the next slot of the ring, unless a snapshot was published less than an
+        interval ago or no viewer is attached. Called after every step of the world
+        :param world: PopulationWorld
+        :return: None
+        """
+        now = time.perf_counter()
+        if now < self.next_publish:
+            return
+        self.next_publish = now + self.interval
+        wall = time.time()
+        self.header['writer_heartbeat'] = wall
+        if wall - float(self.header['heartbeat']) > DETACHED_AFTER:
+            return
+
+        if world.num_ships <= self.max_ships:
+            ships = np.arange(world.num_ships)
+        else:
+            fitness = np.where(world.alive, world.fitness, -np.inf)
+            ships = np.argpartition(-fitness, self.max_ships)[:self.max_ships]
+        asteroids = [(a.x, a.y, a.length, a.angle) for a in world.asteroids][:self.max_asteroids]
+        n = len(ships)
+
+        published = int(self.header['published'])
+        slot = self.ring[published % len(self.ring)]
+        sequence = int(slot['sequence'])
+        slot['sequence'] = sequence + 1
+        slot['generation'] = self.generation
+        slot['frame'] = world.frame
+        slot['num_ships'] = n
+        slot['population'] = world.num_ships
+        slot['alive'] = int(world.alive.sum())
+        slot['num_asteroids'] = len(asteroids)
+        slot['ship'][:n] = ships
+        slot['ship_x'][:n] = world.ship_x[ships]
+        slot['ship_alive'][:n] = world.alive[ships]
+        slot['fitness'][:n] = world.fitness[ships]
+        slot['bullet_x'][:n] = world.bullet_x[ships]
+        slot['bullet_y'][:n] = world.bullet_y[ships]
+        slot['bullet_valid'][:n] = world.bullet_valid[ships]
+        if asteroids:
+            slot['asteroids'][:len(asteroids)] = asteroids
+        slot['sequence'] = sequence + 2
+        self.header['published'] = published + 1
+
+    def close(self):
+        """
+        removes the shared memory, viewers still attached keep the last snapshot
+        :return: None
+        """
+        del self.header, self.ring
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SnapshotReader:
+    """
+    Viewer side of the ring, attached to the memory of a running SnapshotWriter
+    """
+
+    def __init__(self, name=NAME):
+        """
+        :param name: name of the shared memory
+        :raise FileNotFoundError: when no training is publishing under that name
+        """
+        self.memory = shared_memory.SharedMemory(name)
+        _untrack(self.memory)
+        self.header = np.ndarray((), HEADER, self.memory.buf)
+        if bytes(self.header['magic']) != MAGIC or int(self.header['version']) != VERSION:
+            raise ValueError(name + ' is not a version ' + str(VERSION) + ' spectator memory')
+        self.dtype = snapshot_dtype(int(self.header['max_ships']), int(self.header['max_asteroids']))
+        self.ring = np.ndarray((int(self.header['slots']),), self.dtype, self.memory.buf, HEADER.itemsize)
+
+    def heartbeat(self):
+        """
+        tells the writer a viewer is attached
+        :return: None
+        """
+        self.header['heartbeat'] = time.time()
+
+    def latest(self):
+        """
+        :return: copy of the newest complete snapshot, None if there is none yet or it was being written
+        """
+        published = int(self.header['published'])
+        if not published:
+            return None
+        slot = self.ring[(published - 1) % len(self.ring)]
+        sequence = int(slot['sequence'])
+        snapshot = slot.copy()
+        if sequence % 2 or int(slot['sequence']) != sequence:
+            return None
+        return snapshot
+
+    @property
+    def ended(self):
+        """
+        :return: True when the writer has not been heard of for a while, its run is over or it was killed
+        """
+        return time.time() - float(self.header['writer_heartbeat']) > ENDED_AFTER
+
+    def close(self):
+        """
+        detaches from the memory
+        :return: None
+        """
+        del self.header, self.ring
+        self.memory.close()
+
+
+def view(name=NAME, top=None, fps=30):
+    """
+    Window drawing the snapshots of a training run until it is closed. It waits for a run to start and carries on
+    with the next one when a run ends
+    :param name: name of the shared memory
+    :param top: only draws the ships with the best fitness, None for all of them
+    :param fps: frames drawn per second
+    :return: None
+    """
+    import pygame
+
+    import assets
+
+    pygame.font.init()
+    window = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption('Space Invader - spectator')
+    font = pygame.font.SysFont('comicsans', 20)
+    ship_image = pygame.transform.rotate(
+        pygame.transform.scale(assets.image('spaceship.png'), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT)), 180)
+    sprites = assets.asteroid_sprites()
+    clock = pygame.time.Clock()
+
+    reader = None
+    snapshot = None
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if reader is not None:
+                    reader.close()
+                pygame.quit()
+                return
+
+        if reader is None:
+            try:
+                reader = SnapshotReader(name)
+            except (FileNotFoundError, ValueError):
+                pass
+        if reader is not None:
+            reader.heartbeat()
+            latest = reader.latest()
+            snapshot = snapshot if latest is None else latest
+            if reader.ended:
+                # A new run makes new memory under the same name
+                reader.close()
+                reader = None
+
+        window.fill((0, 0, 0))
+        if snapshot is None:
+            window.blit(font.render('Waiting for a training run', True, (255, 255, 255)), (10, 10))
+        else:
+            draw_snapshot(window, snapshot, sprites, ship_image, top)
+            text = 'Generation {}  frame {}  alive {}/{}  best {:.1f}'.format(
+                int(snapshot['generation']), int(snapshot['frame']), int(snapshot['alive']),
+                int(snapshot['population']), float(snapshot['fitness'][:int(snapshot['num_ships'])].max(initial=0)))
+            window.blit(font.render(text, True, (255, 255, 255)), (10, 10))
+        pygame.display.update()
+        clock.tick(fps)
+
+
+def draw_snapshot(window, snapshot, sprites, ship_image, top=None):
+    """
+    :param window: surface to draw on
+    :param snapshot: snapshot from SnapshotReader.latest()
+    :param sprites: AsteroidSprites
+    :param ship_image: image of a spaceship
+    :param top: only draws the ships with the best fitness, None for all of them
+    :return: None
+    """
+    import pygame
+
+    for x, y, length, angle in snapshot['asteroids'][:int(snapshot['num_asteroids'])]:
+        window.blit(sprites.get(int(length), float(angle)), (int(x), int(y)))
+
+    n = int(snapshot['num_ships'])
+    ships = np.flatnonzero(snapshot['ship_alive'][:n])
+    if top is not None:
+        ships = ships[np.argsort(-snapshot['fitness'][ships], kind='stable')[:top]]
+    for i in ships:
+        for bx, by, valid in zip(snapshot['bullet_x'][i], snapshot['bullet_y'][i], snapshot['bullet_valid'][i]):
+            if valid:
+                pygame.draw.rect(window, (255, 255, 0), (int(bx), int(by), Spaceship.BULLET_WIDTH,
+                                                         Spaceship.BULLET_HEIGHT))
+        window.blit(ship_image, (int(snapshot['ship_x'][i]), SHIP_START[1]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watches a training run started with --spectate')
+    parser.add_argument('--top', type=int, help='only draw this many ships, the ones with the best fitness')
+    parser.add_argument('--fps', type=int, default=30, help='frames drawn per second')
+    parser.add_argument('--name', default=NAME, help='name of the shared memory of the run')
+    args = parser.parse_args()
+
+    view(args.name, args.top, args.fps)
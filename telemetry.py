@@ -0,0 +1,214 @@
+"""
+Telemetry of training runs kept on disk. A reporter appends one fixed size binary record per generation, and
+optionally one per genome, to log files that can be loaded as NumPy record arrays while or after the run goes:
+
+    python Training.py --telemetry                   # writes telemetry.generations
+    python telemetry.py telemetry.generations        # prints the run so far
+
+    generations = telemetry.load('telemetry.generations')
+    generations['fitness_max'], generations['frames_per_second']
+
+Records are packed in the training thread, which only costs a few NumPy calls per generation, and written by a
+background thread. A resumed run appends to the logs it finds.
+"""
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+MAGIC = b'SGTL'
+VERSION = 1
+HEADER = struct.Struct('<4sBBH')  # magic, version, kind of record, size of a record
+
+GENERATION = np.dtype([
+    ('generation', '<i4'), ('time', '<f8'), ('population', '<i4'), ('species', '<i4'),
+    ('fitness_min', '<f8'), ('fitness_p25', '<f8'), ('fitness_median', '<f8'), ('fitness_p75', '<f8'),
+    ('fitness_max', '<f8'), ('fitness_mean', '<f8'), ('fitness_std', '<f8'),
+    ('best_key', '<i4'), ('best_nodes', '<i4'), ('best_connections', '<i4'),
+    ('nodes_mean', '<f4'), ('connections_mean', '<f4'),
+    ('ship_frames', '<i8'), ('evaluation_seconds', '<f8'), ('frames_per_second', '<f8'),
+])
+GENOME = np.dtype([
+    ('generation', '<i4'), ('key', '<i4'), ('species', '<i4'), ('fitness', '<f8'), ('nodes', '<i4'),
+    ('connections', '<i4'),
+])
+KINDS = [GENERATION, GENOME]  # the position in the list is the kind stored in the header
+
+
+def open_log(path, dtype):
+    """
+    :param path: log file, made with a header if it does not exist yet
+    :param dtype: GENERATION or GENOME
+    :return: file opened for appending
+    """
+    kind = KINDS.index(dtype)
+    if os.path.exists(path) and os.path.getsize(path):
+        check_header(path, dtype)
+        f = open(path, 'ab')
+        # A record cut short by a crash is dropped so the next ones stay aligned
+        f.truncate(HEADER.size + (os.path.getsize(path) - HEADER.size) // dtype.itemsize * dtype.itemsize)
+        return f
+    f = open(path, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, kind, dtype.itemsize))
+    return f
+
+
+def check_header(path, dtype=None):
+    """
+    :param path: log file
+    :param dtype: dtype the records must have, None for any
+    :return: dtype of the records
+    """
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(path + ' is not a telemetry log')
+    magic, version, kind, size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or kind >= len(KINDS) or KINDS[kind].itemsize != size:
+        raise ValueError(path + ' is not a version ' + str(VERSION) + ' telemetry log')
+    if dtype is not None and KINDS[kind] != dtype:
+        raise ValueError(path + ' does not hold ' + ('generation' if dtype == GENERATION else 'genome') + ' records')
+    return KINDS[kind]
+
+
+def load(path, mmap=True):
+    """
+    :param path: log file
+    :param mmap: maps the file instead of reading it, only the records that are used are read from disk
+    :return: NumPy record array with one row per record
+    """
+    dtype = check_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if not count:
+        return np.zeros(0, dtype)
+    if mmap:
+        return np.memmap(path, dtype, 'r', HEADER.size, (count,))
+    return np.fromfile(path, dtype, count, offset=HEADER.size)
+
+
+def stream(path, chunk=4096):
+    """
+    Reads a log in chunks, e.g. one too large for memory or one still being written
+    :param path: log file
+    :param chunk: records per chunk
+    :return: generator of NumPy record arrays of at most chunk records
+    """
+    dtype = check_header(path)
+    with open(path, 'rb') as f:
+        f.seek(HEADER.size)
+        while True:
+            data = f.read(chunk * dtype.itemsize)
+            count = len(data) // dtype.itemsize
+            if count:
+                yield np.frombuffer(data[:count * dtype.itemsize], dtype)
+            if len(data) < chunk * dtype.itemsize:
+                return
+
+
+class TelemetryReporter(BaseReporter):
+    """
+    Reporter appending the telemetry of every generation to path.generations, and of every genome to path.genomes
+    when asked to. The ship-frames simulated are counted by the evaluation functions in the stats dictionary
+    """
+
+    def __init__(self, path='telemetry', genomes=False):
+        """
+        :param path: prefix of the log files
+        :param genomes: also logs every genome of every generation
+        """
+        self.stats = {}  # handed to the evaluation, emptied every generation
+        self.generation = 0
+        self.started = time.perf_counter()
+        self.files = {GENERATION: open_log(path + '.generations', GENERATION)}
+        if genomes:
+            self.files[GENOME] = open_log(path + '.genomes', GENOME)
+
+        self.jobs = queue.Queue()
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def _write(self):
+        """
+        Background thread appending the queued (file, bytes) jobs until it gets None
+        :return: None
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            f, data = job
+            f.write(data)
+            if self.jobs.empty():
+                f.flush()
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.stats.clear()
+        self.started = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        elapsed = time.perf_counter() - self.started
+        genomes = list(population.values())
+        fitness = np.array([g.fitness for g in genomes], dtype=float)
+        nodes = np.array([len(g.nodes) for g in genomes])
+        connections = np.array([sum(1 for c in g.connections.values() if c.enabled) for g in genomes])
+        ship_frames = self.stats.get('ship_frames', 0)
+
+        record = np.zeros((), GENERATION)
+        record['generation'] = self.generation
+        record['time'] = time.time()
+        record['population'] = len(genomes)
+        record['species'] = len(species.species)
+        (record['fitness_min'], record['fitness_p25'], record['fitness_median'], record['fitness_p75'],
+         record['fitness_max']) = np.percentile(fitness, [0, 25, 50, 75, 100])
+        record['fitness_mean'] = fitness.mean()
+        record['fitness_std'] = fitness.std()
+        record['best_key'] = best_genome.key
+        record['best_nodes'] = len(best_genome.nodes)
+        record['best_connections'] = sum(1 for c in best_genome.connections.values() if c.enabled)
+        record['nodes_mean'] = nodes.mean()
+        record['connections_mean'] = connections.mean()
+        record['ship_frames'] = ship_frames
+        record['evaluation_seconds'] = elapsed
+        record['frames_per_second'] = ship_frames / elapsed if elapsed > 0 else 0
+        self.jobs.put((self.files[GENERATION], record.tobytes()))
+
+        if GENOME in self.files:
+            records = np.zeros(len(genomes), GENOME)
+            records['generation'] = self.generation
+            records['key'] = [g.key for g in genomes]
+            records['species'] = [species.get_species_id(g.key) for g in genomes]
+            records['fitness'] = fitness
+            records['nodes'] = nodes
+            records['connections'] = connections
+            self.jobs.put((self.files[GENOME], records.tobytes()))
+
+    def close(self):
+        """
+        waits for the pending writes and closes the logs
+        :return: None
+        """
+        self.jobs.put(None)
+        self.writer.join()
+        for f in self.files.values():
+            f.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prints the generations of a telemetry log')
+    parser.add_argument('path', help='log written by Training.py --telemetry, e.g. telemetry.generations')
+    parser.add_argument('--last', type=int, default=20, help='number of generations printed, 0 for all')
+    args = parser.parse_args()
+
+    generations = load(args.path)
+    print('{:>6} {:>8} {:>8} {:>8} {:>7} {:>6} {:>12} {:>8} {:>10}'.format(
+        'gen', 'max', 'median', 'mean', 'species', 'nodes', 'ship-frames', 'seconds', 'frames/s'))
+    for r in generations[-args.last:] if args.last else generations:
+        print('{:>6} {:>8.1f} {:>8.1f} {:>8.1f} {:>7} {:>6.1f} {:>12} {:>8.2f} {:>10.0f}'.format(
+            r['generation'], r['fitness_max'], r['fitness_median'], r['fitness_mean'], r['species'], r['nodes_mean'],
+            r['ship_frames'], r['evaluation_seconds'], r['frames_per_second']))
@@ -0,0 +1,67 @@
+"""
+Fixtures shared by the tests. The modules of the game are scripts at the top of the repository, so it is put on the
+import path here
+"""
+import copy
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+from batch_network import ACTIVATIONS  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def config():
+    """
+    :return: neat configuration of the project
+    """
+    return benchmark.load_config()
+
+
+@pytest.fixture(scope='session')
+def genomes(config):
+    """
+    :return: the shipped genome and mutated copies of it, pilots that differ but still live long enough to see many
+    asteroids
+    """
+    base = benchmark.load_genome()
+    state = random.getstate()
+    random.seed(3)
+    result = []
+    for key in range(12):
+        genome = copy.deepcopy(base)
+        genome.key = key
+        for _ in range(random.randrange(3)):
+            genome.mutate(config.genome_config)
+        result.append(genome)
+    random.setstate(state)
+    return result
+
+
+@pytest.fixture(scope='session')
+def grown(config, genomes):
+    """
+    :return: copies of the genomes with hidden nodes, new connections and every activation neat, BatchNetwork and the
+    network files all know
+    """
+    rng = random.Random(7)
+    # neat mutates with the global random module
+    state = random.getstate()
+    random.seed(7)
+    result = []
+    for genome in genomes:
+        genome = copy.deepcopy(genome)
+        for _ in range(rng.randrange(1, 6)):
+            genome.mutate_add_node(config.genome_config)
+        for _ in range(rng.randrange(8)):
+            genome.mutate_add_connection(config.genome_config)
+        for node in genome.nodes.values():
+            node.activation = rng.choice(sorted(ACTIVATIONS))
+        result.append(genome)
+    random.setstate(state)
+    return result
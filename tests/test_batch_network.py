@@ -0,0 +1,29 @@
+"""
+BatchNetwork against one neat.nn.FeedForwardNetwork per genome
+"""
+import copy
+
+import neat
+import numpy as np
+import pytest
+
+from batch_network import BatchNetwork
+
+
+def test_batch_network_matches_neat(config, grown):
+    inputs = np.random.default_rng(1).uniform(-600, 600, (len(grown), 5))
+    outputs = BatchNetwork(grown, config).activate(inputs)
+    for row, genome in enumerate(grown):
+        expected = neat.nn.FeedForwardNetwork.create(genome, config).activate(inputs[row].tolist())
+        np.testing.assert_allclose(outputs[row], expected, rtol=1e-12, atol=1e-12)
+
+
+def test_batch_network_unreachable_output_is_zero(config, genomes):
+    genome = copy.deepcopy(genomes[0])
+    output = config.genome_config.output_keys[1]
+    for key, connection in genome.connections.items():
+        if key[1] == output:
+            connection.enabled = False
+    outputs = BatchNetwork([genome], config).activate(np.ones((1, 5)))
+    assert outputs[0, 1] == 0.0
+    assert outputs[0].tolist() == pytest.approx(neat.nn.FeedForwardNetwork.create(genome, config).activate([1.0] * 5))
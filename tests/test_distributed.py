@@ -0,0 +1,110 @@
+"""
+DistributedEvaluator with workers in other processes, against evaluate_genomes run in this process
+"""
+import multiprocessing
+import socket
+import threading
+import time
+from multiprocessing.connection import Client
+
+import pytest
+
+import distributed
+from distributed import DistributedEvaluator, run_worker
+from evaluation import evaluate_genomes
+
+KEY = b'test-key'
+SEED = 9
+
+
+def slow_evaluate(genomes, config, seed, stats=None):
+    """
+    evaluate_genomes that takes long enough for a worker to be killed in the middle of a batch
+    :param genomes: list of genomes
+    :param config: neat configuration
+    :param seed: seed of the asteroid stream
+    :param stats: dictionary the simulated ship-frames are added to
+    :return: list with the fitness of every genome
+    """
+    time.sleep(0.5)
+    return evaluate_genomes(genomes, config, seed, stats=stats)
+
+
+def start_worker(evaluator):
+    """
+    :param evaluator: DistributedEvaluator the worker connects to
+    :return: the worker process
+    """
+    process = multiprocessing.Process(target=run_worker, args=(evaluator.address, KEY, 0.1), daemon=True)
+    process.start()
+    return process
+
+
+def wait_for_workers(evaluator, count):
+    """
+    :param evaluator: DistributedEvaluator
+    :param count: number of workers to wait for
+    :return: None
+    """
+    deadline = time.time() + 10
+    while evaluator.workers < count:
+        assert time.time() < deadline, 'the workers did not connect'
+        time.sleep(0.05)
+
+
+def test_workers_match_evaluate_genomes(config, genomes):
+    stats = {}
+    evaluator = DistributedEvaluator(('localhost', 0), KEY, batch_size=3, seed=SEED, stats=stats)
+    workers = [start_worker(evaluator) for _ in range(2)]
+    try:
+        wait_for_workers(evaluator, 2)
+        evaluator.evaluate([(g.key, g) for g in genomes], config)
+    finally:
+        evaluator.close()
+    for worker in workers:
+        worker.join(10)
+
+    expected_stats = {}
+    assert [g.fitness for g in genomes] == evaluate_genomes(genomes, config, SEED, stats=expected_stats)
+    assert stats == expected_stats
+    assert [worker.exitcode for worker in workers] == [0, 0]
+
+
+def test_batch_of_a_dead_worker_goes_to_another_worker(config, genomes):
+    evaluator = DistributedEvaluator(('localhost', 0), KEY, batch_size=len(genomes), function=slow_evaluate,
+                                     seed=SEED)
+    first = start_worker(evaluator)
+    try:
+        wait_for_workers(evaluator, 1)
+        pairs = [(g.key, g) for g in genomes]
+        evaluation = threading.Thread(target=evaluator.evaluate, args=(pairs, config), daemon=True)
+        evaluation.start()
+        time.sleep(0.2)
+        first.kill()
+        second = start_worker(evaluator)
+        evaluation.join(30)
+        assert not evaluation.is_alive()
+    finally:
+        evaluator.close()
+    second.join(10)
+    assert [g.fitness for g in genomes] == evaluate_genomes(genomes, config, SEED)
+
+
+def test_handshake(monkeypatch):
+    monkeypatch.setattr(distributed, 'HANDSHAKE_TIMEOUT', 1)
+    evaluator = DistributedEvaluator(('localhost', 0), KEY)
+    try:
+        # A client that connects and says nothing does not keep the others from joining
+        silent = socket.create_connection(evaluator.address)
+        Client(evaluator.address, authkey=KEY).close()
+        with pytest.raises(multiprocessing.AuthenticationError):
+            Client(evaluator.address, authkey=b'wrong')
+
+        # and it is dropped once its time is up
+        silent.settimeout(5)
+        challenge = silent.recv(1024)
+        assert b'#CHALLENGE#' in challenge
+        assert silent.recv(1024) == b''
+        silent.close()
+    finally:
+        evaluator.close()
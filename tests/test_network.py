@@ -0,0 +1,47 @@
+"""
+Network files written by export() and loaded as a CompiledNetwork, against neat.nn.FeedForwardNetwork
+"""
+import os
+
+import neat
+import numpy as np
+import pytest
+
+import benchmark
+import network
+
+
+def test_compiled_network_matches_neat(config, grown, tmp_path):
+    inputs = np.random.default_rng(2).uniform(-600, 600, (200, 5)).tolist()
+    for genome in grown:
+        path = str(tmp_path / 'net')
+        network.export(genome, config, path)
+        compiled = network.load(path)
+        expected = neat.nn.FeedForwardNetwork.create(genome, config)
+        for row in inputs:
+            # Bit for bit, the aimbot of the game must play like the genome it was exported from
+            assert compiled.activate(row) == expected.activate(row)
+
+
+def test_shipped_network_file_matches_shipped_genome(config):
+    compiled = network.load(os.path.join(benchmark.LOCAL_DIR, 'neuralNetwork.net'))
+    expected = neat.nn.FeedForwardNetwork.create(benchmark.load_genome(), config)
+    for row in np.random.default_rng(3).uniform(-600, 600, (200, 5)).tolist():
+        assert compiled.activate(row) == expected.activate(row)
+
+
+def test_load_rejects_other_files(config, genomes, tmp_path):
+    path = str(tmp_path / 'net')
+    network.export(genomes[0], config, path)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path, 'wb') as f:
+        f.write(b'XXXX' + data[4:])
+    with pytest.raises(ValueError, match='not a network file'):
+        network.load(path)
+
+    with open(path, 'wb') as f:
+        f.write(data[:4] + bytes([network.VERSION + 1]) + data[5:])
+    with pytest.raises(ValueError, match='version'):
+        network.load(path)
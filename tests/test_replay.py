@@ -0,0 +1,47 @@
+"""
+Recordings made while a game is played, replayed headless to the same final state
+"""
+import random
+
+import benchmark
+import replay
+from simulation import GameWorld
+
+
+def play(path, seed, ticks):
+    """
+    Plays a game with random keys and a few turns of the aimbot and records it
+    :param path: file the recording is saved to
+    :param seed: seed of the game
+    :param ticks: ticks played at most
+    :return: GameWorld at the end of the game
+    """
+    rng = random.Random(seed)
+    world = GameWorld(seed, replay.load_pilot(benchmark.LOCAL_DIR))
+    recorder = replay.Recorder(seed)
+    while not world.done and world.frame < ticks:
+        keys = (rng.random() < 0.3, rng.random() < 0.3, rng.random() < 0.2, rng.random() < 0.005)
+        recorder.record(*keys)
+        world.step(*keys)
+    recorder.save(path, world)
+    return world
+
+
+def test_replay_reaches_the_recorded_state(tmp_path):
+    path = str(tmp_path / 'game.rec')
+    played = play(path, 21, 20000)
+    world, matches = replay.replay(path, replay.load_pilot(benchmark.LOCAL_DIR))
+    assert matches
+    assert world.frame == played.frame and world.ship.score == played.ship.score
+    assert replay.state_hash(world) == replay.state_hash(played)
+
+
+def test_replay_notices_a_changed_recording(tmp_path):
+    path = str(tmp_path / 'game.rec')
+    play(path, 22, 3000)
+    recording = replay.load(path)
+    # The same game with the seed of another one does not end in the recorded state
+    with open(path, 'r+b') as f:
+        f.write(replay.HEADER.pack(replay.MAGIC, replay.VERSION, recording['seed'] + 1))
+    _, matches = replay.replay(path, replay.load_pilot(benchmark.LOCAL_DIR))
+    assert not matches
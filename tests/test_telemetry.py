@@ -0,0 +1,81 @@
+"""
+Telemetry logs written by a TelemetryReporter during a short training run and read back
+"""
+import os
+
+import neat
+import numpy as np
+import pytest
+
+import telemetry
+from evaluation import evaluate_genomes
+
+
+def train(config, prefix, generations):
+    """
+    Runs a few generations with telemetry of every genome
+    :param config: neat configuration
+    :param prefix: prefix of the logs
+    :param generations: number of generations
+    :return: neat.Population after the run
+    """
+    population = neat.Population(config)
+    reporter = telemetry.TelemetryReporter(prefix, genomes=True)
+    population.add_reporter(reporter)
+
+    def fitness(genomes, config):
+        for (_, g), value in zip(genomes, evaluate_genomes([g for _, g in genomes], config, 1, stats=reporter.stats)):
+            g.fitness = value
+
+    try:
+        population.run(fitness, generations)
+    finally:
+        reporter.close()
+    return population
+
+
+def test_logs_hold_every_generation_and_genome(config, tmp_path):
+    prefix = str(tmp_path / 'run')
+    population = train(config, prefix, 2)
+
+    generations = telemetry.load(prefix + '.generations')
+    assert generations['generation'].tolist() == [0, 1]
+    assert (generations['population'] == config.pop_size).all()
+    assert (generations['ship_frames'] > 0).all()
+    assert (generations['fitness_min'] <= generations['fitness_median']).all()
+    assert (generations['fitness_median'] <= generations['fitness_max']).all()
+    assert generations['fitness_max'][-1] <= population.best_genome.fitness
+
+    genomes = telemetry.load(prefix + '.genomes', mmap=False)
+    assert len(genomes) == 2 * config.pop_size
+    for generation in (0, 1):
+        rows = genomes[genomes['generation'] == generation]
+        assert rows['fitness'].max() == generations['fitness_max'][generation]
+
+    chunks = list(telemetry.stream(prefix + '.genomes', chunk=7))
+    assert np.array_equal(np.concatenate(chunks), genomes)
+
+
+def test_resume_appends_after_a_record_cut_short(config, tmp_path):
+    prefix = str(tmp_path / 'run')
+    train(config, prefix, 1)
+    path = prefix + '.generations'
+    with open(path, 'ab') as f:
+        f.write(b'\0' * (telemetry.GENERATION.itemsize // 2))
+
+    train(config, prefix, 1)
+    assert (os.path.getsize(path) - telemetry.HEADER.size) % telemetry.GENERATION.itemsize == 0
+    assert len(telemetry.load(path)) == 2
+
+
+def test_check_header_rejects_other_files(config, tmp_path):
+    prefix = str(tmp_path / 'run')
+    train(config, prefix, 1)
+    with pytest.raises(ValueError, match='does not hold generation records'):
+        telemetry.check_header(prefix + '.genomes', telemetry.GENERATION)
+
+    path = str(tmp_path / 'other')
+    with open(path, 'wb') as f:
+        f.write(b'not a log')
+    with pytest.raises(ValueError, match='not a version'):
+        telemetry.load(path)
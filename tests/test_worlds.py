@@ -0,0 +1,88 @@
+"""
+The vectorized worlds against SimulationWorld, the reference they must match exactly given the same seed and actions
+"""
+import neat
+import numpy as np
+import pytest
+
+from batch_network import BatchNetwork
+from evaluation import evaluate_genomes
+from population import PopulationWorld
+from simulation import SimulationWorld
+from vecenv import ASTEROID_SLOTS, VectorEnv, WorldBatch
+
+
+@pytest.mark.parametrize('seed', [11, 12])
+def test_population_world_matches_simulation_world(config, genomes, seed):
+    net = neat.nn.FeedForwardNetwork.create(genomes[0], config)
+    n = 8
+    # From no noise for the first ship, which flies long enough to see many asteroids, to a lot for the last one
+    noise = np.random.default_rng(seed).normal(0, 1, (40000, n, 2)) * np.linspace(0, 0.6, n)[:, None]
+    world = SimulationWorld(n, seed)
+    population = PopulationWorld(n, seed)
+
+    while not world.done:
+        assert not population.done
+        observations, active = population.observe()
+        actions = np.zeros((n, 2))
+        for x, observation in enumerate(world.observe()):
+            assert active[x] == (observation is not None), (world.frame, x)
+            if observation is not None:
+                assert tuple(observations[x]) == observation, (world.frame, x)
+                actions[x] = np.array(net.activate(observation)) + noise[world.frame, x]
+        world.step([tuple(a) if active[x] else None for x, a in enumerate(actions)])
+        population.step(actions)
+        assert population.fitness.tolist() == world.fitness, world.frame
+
+    assert population.done
+    assert population.score.tolist() == [ship.score for ship in world.ships]
+    # The ring of asteroid slots went round, slots were reused by later asteroids
+    assert population.asteroids.next_id > population.asteroids.capacity
+
+
+def test_world_batch_matches_simulation_world(config, genomes):
+    net = BatchNetwork(genomes, config)
+    seeds = list(range(len(genomes)))
+    batch = WorldBatch(len(genomes))
+    batch.reset(np.arange(len(genomes)), seeds)
+    worlds = [SimulationWorld(1, seed) for seed in seeds]
+
+    while not batch.done.all():
+        observations, active = batch.observe()
+        actions = net.activate(observations)
+        for i, world in enumerate(worlds):
+            observation = world.observe()[0]
+            assert active[i] == (observation is not None), (world.frame, i)
+            if observation is not None:
+                assert tuple(observations[i]) == observation, (world.frame, i)
+            if not world.done:
+                world.step([tuple(actions[i]) if observation is not None else None])
+        batch.step(actions)
+        for i, world in enumerate(worlds):
+            if not world.done or batch.alive[i]:
+                assert batch.fitness[i] == world.fitness[0], (world.frame, i)
+                assert batch.score[i] == world.ships[0].score, (world.frame, i)
+
+    assert all(world.done for world in worlds)
+    # Worlds saw more asteroids than the table has slots, so slots were reused
+    assert batch.num_asteroids.max() > ASTEROID_SLOTS
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_vector_env_matches_evaluate_genomes(config, genomes, workers):
+    # Ships never interact, so a genome alone in a world scores what it scores in the shared world of evaluate_genomes
+    seed = 5
+    expected = evaluate_genomes(genomes, config, seed)
+    net = BatchNetwork(genomes, config)
+    env = VectorEnv(len(genomes), workers)
+    try:
+        observations = env.reset([seed] * len(genomes))
+        fitness = [None] * len(genomes)
+        while None in fitness:
+            observations, _, _, info = env.step(net.activate(observations))
+            for world, value in zip(info.get('ended', []), info.get('fitness', [])):
+                if fitness[world] is None:
+                    fitness[world] = value
+    finally:
+        env.close()
+    assert fitness == expected
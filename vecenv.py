@@ -0,0 +1,359 @@
+"""
+Vector environment for learning code other than NEAT. N independent worlds, each one spaceship facing its own stream
+of asteroids, are stepped together:
+
+    env = VectorEnv(64)
+    obs = env.reset(seeds)                          # (N, 5), or (N, observer.size) with an Observer
+    obs, reward, done, info = env.step(actions)     # actions (N, 2), the two outputs a network gives Training.main
+
+The observations are the five inputs Training.main feeds to the networks and the reward of a frame is the change of
+the fitness Training uses. A world whose episode ends is reset right away with a seed drawn from its own seed, its
+last observation, fitness and score are in info. Ships and asteroids of all worlds are NumPy arrays, so a step costs
+a few array operations whatever N is, and the worlds can be spread over worker processes that write their results
+straight into shared memory.
+"""
+import math
+import multiprocessing
+import random
+
+import numpy as np
+
+from observations import AsteroidTable, Observer
+from ship_arrays import FAR, ShipArrays
+from simulation import Asteroid, MAX_ASTEROIDS, SHIP_START, SPAWN_INTERVAL
+
+ASTEROID_SLOTS = 16  # asteroids on screen at once in one world
+
+
+class WorldBatch(ShipArrays):
+    """
+    Struct-of-arrays version of N SimulationWorlds with one ship each. Given the same seed and actions a world plays
+    out exactly like SimulationWorld(1, seed). The ships follow the rules of ship_arrays like the ones of a
+    PopulationWorld, only the asteroids are kept per world
+    """
+
+    def __init__(self, num_worlds, observer=None):
+        """
+        :param num_worlds: number of worlds
+        :param observer: Observer building the observations, the five inputs of Training by default
+        """
+        n = self.num_worlds = num_worlds
+        self.observer = observer or Observer()
+        self.rngs = [random.Random() for _ in range(n)]
+        self.frame = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.num_asteroids = np.zeros(n, dtype=np.int64)
+        self.allocate_ships(n)
+        self.alive[:] = False  # until the worlds are reset
+
+        # Asteroids: on screen, not yet shot or missed by the ship, spawn order and frame they are removed at
+        self.ax = np.zeros((n, ASTEROID_SLOTS))
+        self.ay = np.zeros((n, ASTEROID_SLOTS))
+        self.dx = np.zeros((n, ASTEROID_SLOTS))
+        self.dy = np.zeros((n, ASTEROID_SLOTS))
+        self.angle = np.zeros((n, ASTEROID_SLOTS))
+        self.length = np.zeros((n, ASTEROID_SLOTS), dtype=np.int64)
+        self.valid = np.zeros((n, ASTEROID_SLOTS), dtype=bool)
+        self.available = np.zeros((n, ASTEROID_SLOTS), dtype=bool)
+        self.order = np.zeros((n, ASTEROID_SLOTS), dtype=np.int64)
+        self.expires = np.zeros((n, ASTEROID_SLOTS), dtype=np.int64)
+
+        # The observer reads the asteroids from a table sharing the arrays that do not change while they fly
+        self.table = AsteroidTable(ASTEROID_SLOTS, n)
+        self.table.angle, self.table.velocity, self.table.order = self.angle, self.dy, self.order
+
+    def reset(self, worlds, seeds):
+        """
+        Starts new episodes
+        :param worlds: indices of the worlds to reset
+        :param seeds: seed of every one of those worlds
+        :return: None
+        """
+        for world, seed in zip(worlds, seeds):
+            self.rngs[world].seed(seed)
+        for name in ('frame', 'count', 'num_asteroids', 'tick', 'score', 'fitness', 'wasted'):
+            getattr(self, name)[worlds] = 0
+        self.ship_x[worlds] = SHIP_START[0]
+        self.alive[worlds] = True
+        self.bullet_valid[worlds] = False
+        self.valid[worlds] = False
+        self.available[worlds] = False
+
+    @property
+    def done(self):
+        """
+        :return: (N,) bool array of the worlds whose ship is dead or that spawned all the asteroids of an episode
+        """
+        return ~self.alive | (self.num_asteroids > MAX_ASTEROIDS)
+
+    def observe(self):
+        """
+        :return: (N, observer.size) float array starting with (asteroid x, asteroid y, asteroid angle, ship x, ship y)
+        for the oldest asteroid the ship has not dealt with, and a (N,) bool array of the worlds that have such an
+        asteroid. The asteroid columns of the other worlds are 0
+        """
+        half = self.length // 2
+        self.table.x[:] = self.ax.astype(np.int64) + half
+        self.table.y[:] = self.ay.astype(np.int64) + half
+        self.table.half[:] = half
+        return self.observer(self.table, self.available, self.ship_x, self.ship_y, self.alive)
+
+    def spawn(self, world):
+        """
+        Puts a new asteroid in a world, drawn from the world's random stream like SimulationWorld does
+        :param world: index of the world
+        :return: None
+        """
+        free = np.flatnonzero(~self.valid[world])
+        if not len(free):
+            raise RuntimeError('More than ' + str(ASTEROID_SLOTS) + ' asteroids on screen')
+        slot = free[0]
+        asteroid = Asteroid(self.rngs[world])
+        self.ax[world, slot] = asteroid.x
+        self.ay[world, slot] = asteroid.y
+        self.dx[world, slot] = asteroid.VELOCITY * math.sin(asteroid.angle)
+        self.dy[world, slot] = asteroid.VELOCITY * math.cos(asteroid.angle)
+        self.angle[world, slot] = asteroid.angle
+        self.length[world, slot] = asteroid.length
+        self.valid[world, slot] = True
+        self.available[world, slot] = self.alive[world]
+        self.order[world, slot] = self.num_asteroids[world]
+        self.expires[world, slot] = self.frame[world] + asteroid.lifetime()
+        self.num_asteroids[world] += 1
+        self.count[world] = 0
+
+    def step(self, actions):
+        """
+        Advances every world by one frame, in the same order as SimulationWorld.step
+        :param actions: (N, 2) array with the two network outputs of every ship, ignored while a ship has no asteroid
+        to look at
+        :return: None
+        """
+        self.frame += 1
+        self.count += 1
+        self.act(np.asarray(actions))
+
+        # Asteroids that went past the ship are removed, a ship that did not shoot one of them dies
+        expired = self.valid & (self.expires <= self.frame[:, None])
+        self.miss((expired & self.available).any(axis=1))
+        self.valid &= ~expired
+
+        for world in np.flatnonzero(self.count >= SPAWN_INTERVAL):
+            self.spawn(world)
+
+        self.ax += self.dx * self.valid
+        self.ay += self.dy * self.valid
+        self.advance()
+
+        self.collide()
+
+    def collide(self):
+        """
+        checks the asteroids of every world against its bullets and ship, in spawn order so a bullet touching two
+        asteroids hits the older one
+        :return: None
+        """
+        self.collide_asteroids(self._asteroids())
+
+    def _asteroids(self):
+        """
+        :return: generator of the asteroids of every world ranked by spawn order, the oldest available one of every
+        world first, as collide_asteroids takes them
+        """
+        rows = np.arange(self.num_worlds)
+        order = np.argsort(np.where(self.available, self.order, FAR), axis=1)
+        for rank in range(int(self.available.sum(axis=1).max(initial=0))):
+            j = order[:, rank]
+            yield (self.available[rows, j], j, self.ax[rows, j].astype(np.int64)[:, None],
+                   self.ay[rows, j].astype(np.int64)[:, None], self.length[rows, j][:, None])
+
+
+class _Shard:
+    """
+    Worlds first to last of a VectorEnv stepped in the current process, with their results written into the arrays of
+    the env
+    """
+
+    def __init__(self, first, last, obs, reward, done, actions, observer=None):
+        """
+        :param first: index of the first world
+        :param last: index after the last world
+        :param obs: (N, observer.size) observations of the env
+        :param reward: (N,) rewards of the env
+        :param done: (N,) done flags of the env
+        :param actions: (N, 2) actions of the env
+        :param observer: Observer of the env
+        """
+        self.worlds = WorldBatch(last - first, observer)
+        self.obs, self.reward, self.done = obs[first:last], reward[first:last], done[first:last]
+        self.actions = actions[first:last]
+        self.reseed = [random.Random() for _ in range(last - first)]
+
+    def reset(self, seeds):
+        """
+        :param seeds: seed of every world of the shard
+        :return: None
+        """
+        for rng, seed in zip(self.reseed, seeds):
+            rng.seed(seed)
+        self.worlds.reset(np.arange(len(seeds)), seeds)
+        self.obs[:] = self.worlds.observe()[0]
+
+    def step(self):
+        """
+        Steps the worlds with the actions in the shared array and resets the ones that are done
+        :return: info dictionary of the shard, indices are relative to the shard
+        """
+        worlds = self.worlds
+        before = worlds.fitness.copy()
+        worlds.step(self.actions)
+        self.reward[:] = worlds.fitness - before
+        self.done[:] = worlds.done
+
+        info = {}
+        ended = np.flatnonzero(self.done)
+        if len(ended):
+            info = {'ended': ended, 'final_observation': worlds.observe()[0][ended],
+                    'fitness': worlds.fitness[ended].copy(), 'score': worlds.score[ended].copy(),
+                    'frames': worlds.frame[ended].copy()}
+            worlds.reset(ended, [self.reseed[world].randrange(2 ** 63) for world in ended])
+        self.obs[:], active = worlds.observe()
+        info['active'] = active
+        return info
+
+
+def _shared_array(shape, dtype):
+    """
+    :param shape: shape of the array
+    :param dtype: NumPy dtype
+    :return: (multiprocessing RawArray, NumPy view of it)
+    """
+    dtype = np.dtype(dtype)
+    raw = multiprocessing.RawArray('b', int(np.prod(shape)) * dtype.itemsize)
+    return raw, np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+def _worker(connection, first, last, buffers, num_worlds, observer):
+    """
+    Loop of a worker process, it steps its shard every time it is asked to
+    :param connection: end of a Pipe to the env
+    :param first: index of the first world of the shard
+    :param last: index after the last world of the shard
+    :param buffers: shared (obs, reward, done, actions) RawArrays
+    :param num_worlds: number of worlds of the whole env
+    :param observer: Observer of the env
+    :return: None
+    """
+    obs, reward, done, actions = (np.frombuffer(raw, dtype=dtype).reshape(shape) for raw, dtype, shape in
+                                  zip(buffers, (float, float, bool, float),
+                                      ((num_worlds, observer.size), (num_worlds,), (num_worlds,), (num_worlds, 2))))
+    shard = _Shard(first, last, obs, reward, done, actions, observer)
+    while True:
+        command, argument = connection.recv()
+        if command == 'reset':
+            shard.reset(argument)
+            connection.send(None)
+        elif command == 'step':
+            connection.send(shard.step())
+        else:
+            return
+
+
+class VectorEnv:
+    """
+    reset/step interface over N worlds, stepped in this process or spread over worker processes
+    """
+
+    def __init__(self, num_worlds, workers=0, observer=None):
+        """
+        :param num_worlds: number of worlds
+        :param workers: number of worker processes, 0 steps every world in this process
+        :param observer: Observer building the observations, the five inputs of Training by default
+        """
+        self.num_worlds = num_worlds
+        observer = observer or Observer()
+        bounds = np.linspace(0, num_worlds, max(workers, 1) + 1).astype(int)
+        self.shards = list(zip(bounds[:-1], bounds[1:]))
+
+        if workers:
+            self.buffers = [_shared_array(shape, dtype) for shape, dtype in
+                            (((num_worlds, observer.size), float), ((num_worlds,), float), ((num_worlds,), bool),
+                             ((num_worlds, 2), float))]
+            self.obs, self.reward, self.done, self.actions = (array for _, array in self.buffers)
+            self.connections = []
+            self.processes = []
+            for first, last in self.shards:
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_worker, daemon=True, args=(
+                    child, first, last, [raw for raw, _ in self.buffers], num_worlds, observer))
+                process.start()
+                self.connections.append(parent)
+                self.processes.append(process)
+        else:
+            self.obs = np.zeros((num_worlds, observer.size))
+            self.reward = np.zeros(num_worlds)
+            self.done = np.zeros(num_worlds, dtype=bool)
+            self.actions = np.zeros((num_worlds, 2))
+            self.local = _Shard(0, num_worlds, self.obs, self.reward, self.done, self.actions, observer)
+            self.connections = []
+
+    def reset(self, seeds=None):
+        """
+        Starts a new episode in every world
+        :param seeds: one seed per world, random ones by default
+        :return: (N, observer.size) observations
+        """
+        if seeds is None:
+            seeds = [random.randrange(2 ** 63) for _ in range(self.num_worlds)]
+        if len(seeds) != self.num_worlds:
+            raise ValueError('Expected ' + str(self.num_worlds) + ' seeds, got ' + str(len(seeds)))
+        if not self.connections:
+            self.local.reset(list(seeds))
+        else:
+            for connection, (first, last) in zip(self.connections, self.shards):
+                connection.send(('reset', list(seeds[first:last])))
+            for connection in self.connections:
+                connection.recv()
+        return self.obs.copy()
+
+    def step(self, actions):
+        """
+        Advances every world by one frame, worlds whose episode ended are reset
+        :param actions: (N, 2) array, a positive first column moves right, a negative one left and a second column <= 0
+        shoots
+        :return: (observations (N, observer.size), rewards (N,), done (N,), info) where info has 'active', the worlds
+        with an asteroid to look at, and for the worlds in 'ended' their 'final_observation', 'fitness', 'score' and
+        'frames'
+        """
+        self.actions[:] = actions
+        if not self.connections:
+            info = self.local.step()
+        else:
+            for connection in self.connections:
+                connection.send(('step', None))
+            info = self._merge([connection.recv() for connection in self.connections])
+        return self.obs.copy(), self.reward.copy(), self.done.copy(), info
+
+    def _merge(self, infos):
+        """
+        :param infos: info of every shard
+        :return: info of the env, with world indices of the whole env
+        """
+        merged = {'active': np.concatenate([info['active'] for info in infos])}
+        ended = [(first, info) for (first, _), info in zip(self.shards, infos) if 'ended' in info]
+        if ended:
+            merged['ended'] = np.concatenate([info['ended'] + first for first, info in ended])
+            for key in ('final_observation', 'fitness', 'score', 'frames'):
+                merged[key] = np.concatenate([info[key] for _, info in ended])
+        return merged
+
+    def close(self):
+        """
+        stops the worker processes
+        :return: None
+        """
+        for connection in self.connections:
+            connection.send(('close', None))
+        for process in getattr(self, 'processes', []):
+            process.join()
+        self.connections = []